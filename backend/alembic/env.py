@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from config.config import settings
+from config.config import get_database_settings
 
 
 # this is the Alembic Config object, which provides
@@ -40,7 +40,7 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = settings.DATABASE_URL
+    url = get_database_settings().DATABASE_URL
     if url:
         config.set_main_option("sqlalchemy.url", url)
     else:
@@ -63,7 +63,7 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    url = settings.DATABASE_URL
+    url = get_database_settings().DATABASE_URL
     if url:
         config.set_main_option("sqlalchemy.url", url)
     else:
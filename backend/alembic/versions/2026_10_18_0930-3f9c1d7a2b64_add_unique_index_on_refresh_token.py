@@ -0,0 +1,32 @@
+"""add unique index on refresh_tokens.token
+
+Revision ID: 3f9c1d7a2b64
+Revises: c2bde995ab81
+Create Date: 2026-10-18 09:30:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1d7a2b64'
+down_revision: Union[str, None] = 'c2bde995ab81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("""
+                   CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS
+                   ix_refresh_tokens_token ON refresh_tokens (token)
+                   """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_refresh_tokens_token")
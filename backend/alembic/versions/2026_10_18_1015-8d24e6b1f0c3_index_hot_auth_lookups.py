@@ -0,0 +1,60 @@
+"""index hot auth lookups
+
+Revision ID: 8d24e6b1f0c3
+Revises: 3f9c1d7a2b64
+Create Date: 2026-10-18 10:15:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d24e6b1f0c3'
+down_revision: Union[str, None] = '3f9c1d7a2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    # login and the /register duplicate check look up one column at a time
+    "ux_users_email": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_users_email ON users (email)",
+    "ux_users_username": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_users_username ON users (username)",
+    "ux_email_verification_token_hash": "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_email_verification_token_hash ON email_verification (token_hash)",
+    "ix_email_verification_user_id": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_email_verification_user_id ON email_verification (user_id)",
+    # reuse detection revokes a user's live tokens; revoked rows never need this path
+    "ix_refresh_tokens_active_user": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_refresh_tokens_active_user ON refresh_tokens (user_id, created_at) WHERE NOT revoked",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for column in ("email", "username"):
+        duplicate = bind.execute(
+            sa.text(
+                f"SELECT {column} FROM users GROUP BY {column} HAVING count(*) > 1 LIMIT 1"
+            )
+        ).scalar()
+        if duplicate is not None:
+            raise RuntimeError(
+                f"users.{column} has duplicates (e.g. {duplicate!r}); resolve them before adding the unique index"
+            )
+    with op.get_context().autocommit_block():
+        for statement in INDEXES.values():
+            op.execute(statement)
+    # the composite constraint is implied by the two single-column indexes
+    op.execute("ALTER TABLE users DROP CONSTRAINT IF EXISTS users_email_username_key")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+               ALTER TABLE users
+               ADD CONSTRAINT users_email_username_key UNIQUE (email, username)
+               """)
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,37 @@
+"""index token expiry for cleanup
+
+Revision ID: b71e5c09d2a8
+Revises: 8d24e6b1f0c3
+Create Date: 2026-10-18 11:00:03.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e5c09d2a8'
+down_revision: Union[str, None] = '8d24e6b1f0c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    "ix_refresh_tokens_expires_at": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)",
+    "ix_email_verification_expires_at": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_email_verification_expires_at ON email_verification (expires_at)",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for statement in INDEXES.values():
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
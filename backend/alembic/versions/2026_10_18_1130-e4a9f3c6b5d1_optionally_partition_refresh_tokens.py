@@ -0,0 +1,31 @@
+"""optionally partition refresh_tokens by month of expiry
+
+This revision used to convert the table when run with
+``-x partition_refresh_tokens=true``. A deployment that skipped the flag
+could then never partition without editing alembic_version, so the
+conversion now lives in ``python -m tools.partition_refresh_tokens``, which
+can run at any time and in either direction. Tables converted by this
+revision earlier stay partitioned. Run the tool with ``--undo`` before
+downgrading past this revision.
+
+Revision ID: e4a9f3c6b5d1
+Revises: b71e5c09d2a8
+Create Date: 2026-10-18 11:30:41.207713
+
+"""
+from typing import Sequence, Union
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9f3c6b5d1'
+down_revision: Union[str, None] = 'b71e5c09d2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
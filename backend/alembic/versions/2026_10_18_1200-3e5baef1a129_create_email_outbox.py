@@ -0,0 +1,48 @@
+"""create email_outbox table
+
+Revision ID: 3e5baef1a129
+Revises: e4a9f3c6b5d1
+Create Date: 2026-10-18 12:00:27.418306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e5baef1a129'
+down_revision: Union[str, None] = 'e4a9f3c6b5d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+               CREATE TABLE email_outbox (
+                   outbox_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+                   recipient TEXT NOT NULL,
+                   subject TEXT NOT NULL,
+                   template TEXT NOT NULL,
+                   context JSONB NOT NULL DEFAULT '{}',
+                   attempts INT NOT NULL DEFAULT 0,
+                   next_attempt_at TIMESTAMP NOT NULL,
+                   last_error TEXT,
+                   failed_at TIMESTAMP,
+                   created_at TIMESTAMP NOT NULL
+               )
+               """)
+    op.execute("""
+               CREATE INDEX ix_email_outbox_due
+               ON email_outbox (next_attempt_at) WHERE failed_at IS NULL
+               """)
+    op.execute("""
+               CREATE INDEX ix_email_outbox_failed_at
+               ON email_outbox (failed_at) WHERE failed_at IS NOT NULL
+               """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS email_outbox")
@@ -0,0 +1,40 @@
+"""create rate_limits table
+
+UNLOGGED: the counters are cheap to lose on a crash and are rewritten on
+every throttled request, so they skip the WAL. Only used when
+RATE_LIMIT_BACKEND=postgres.
+
+Revision ID: 56388bbf36d0
+Revises: 3e5baef1a129
+Create Date: 2026-10-18 13:00:52.731044
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '56388bbf36d0'
+down_revision: Union[str, None] = '3e5baef1a129'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+               CREATE UNLOGGED TABLE rate_limits (
+                   key TEXT PRIMARY KEY,
+                   window_index BIGINT NOT NULL,
+                   prev_count INT NOT NULL DEFAULT 0,
+                   count INT NOT NULL DEFAULT 0,
+                   updated_at TIMESTAMP NOT NULL
+               )
+               """)
+    op.execute("CREATE INDEX ix_rate_limits_updated_at ON rate_limits (updated_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS rate_limits")
@@ -0,0 +1,29 @@
+"""index users.created_at for the login filter sync
+
+Revision ID: a90062f8c4d9
+Revises: 56388bbf36d0
+Create Date: 2026-10-18 13:30:14.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a90062f8c4d9'
+down_revision: Union[str, None] = '56388bbf36d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_created_at ON users (created_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_created_at")
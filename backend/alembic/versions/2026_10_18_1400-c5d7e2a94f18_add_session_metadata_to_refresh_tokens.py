@@ -0,0 +1,73 @@
+"""add session metadata to refresh_tokens
+
+Revision ID: c5d7e2a94f18
+Revises: a90062f8c4d9
+Create Date: 2026-10-18 14:00:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d7e2a94f18'
+down_revision: Union[str, None] = 'a90062f8c4d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# keyset pages of a user's live sessions, newest first; also serves the bulk
+# revokes, so it replaces the (user_id, created_at) index
+SESSIONS_INDEX = "ix_refresh_tokens_active_sessions ON refresh_tokens (user_id, created_at, refresh_id) WHERE NOT revoked"
+OLD_INDEX = "ix_refresh_tokens_active_user ON refresh_tokens (user_id, created_at) WHERE NOT revoked"
+
+
+def is_partitioned() -> bool:
+    return bool(
+        op.get_bind()
+        .execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'refresh_tokens'::regclass"))
+        .scalar()
+    )
+
+
+def create_index(definition: str):
+    # a partitioned parent cannot be indexed concurrently
+    if is_partitioned():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {definition}")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {definition}")
+
+
+def drop_index(name: str):
+    if is_partitioned():
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+               ALTER TABLE refresh_tokens
+               ADD COLUMN IF NOT EXISTS user_agent TEXT,
+               ADD COLUMN IF NOT EXISTS ip INET,
+               ADD COLUMN IF NOT EXISTS signed_in_at TIMESTAMP
+               """)
+    create_index(SESSIONS_INDEX)
+    drop_index("ix_refresh_tokens_active_user")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    create_index(OLD_INDEX)
+    drop_index("ix_refresh_tokens_active_sessions")
+    op.execute("""
+               ALTER TABLE refresh_tokens
+               DROP COLUMN IF EXISTS user_agent,
+               DROP COLUMN IF EXISTS ip,
+               DROP COLUMN IF EXISTS signed_in_at
+               """)
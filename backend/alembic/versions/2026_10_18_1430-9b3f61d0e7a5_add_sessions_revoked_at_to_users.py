@@ -0,0 +1,36 @@
+"""add sessions_revoked_at to users
+
+Revision ID: 9b3f61d0e7a5
+Revises: c5d7e2a94f18
+Create Date: 2026-10-18 14:30:52.106381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f61d0e7a5'
+down_revision: Union[str, None] = 'c5d7e2a94f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # when the user's access tokens were last revoked (suspension or
+    # logout-all); workers reload the recent ones after missing notifications
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS sessions_revoked_at TIMESTAMP")
+    with op.get_context().autocommit_block():
+        op.execute("""
+                   CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_sessions_revoked_at
+                   ON users (sessions_revoked_at) WHERE sessions_revoked_at IS NOT NULL
+                   """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_sessions_revoked_at")
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS sessions_revoked_at")
@@ -0,0 +1,50 @@
+"""drop revoked refresh token index
+
+Revision ID: 5bc67943e9d7
+Revises: 9b3f61d0e7a5
+Create Date: 2026-10-18 15:00:12.406318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5bc67943e9d7'
+down_revision: Union[str, None] = '9b3f61d0e7a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# the janitor purges refresh tokens by expires_at only, so nothing reads this
+# index any more; databases migrated before that still have it
+INDEX = "ix_refresh_tokens_revoked_created_at ON refresh_tokens (created_at) WHERE revoked"
+
+
+def is_partitioned() -> bool:
+    return bool(
+        op.get_bind()
+        .execute(sa.text("SELECT relkind = 'p' FROM pg_class WHERE oid = 'refresh_tokens'::regclass"))
+        .scalar()
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # a partitioned parent cannot be indexed concurrently
+    if is_partitioned():
+        op.execute("DROP INDEX IF EXISTS ix_refresh_tokens_revoked_created_at")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_refresh_tokens_revoked_created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if is_partitioned():
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX}")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX}")
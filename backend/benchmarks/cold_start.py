@@ -0,0 +1,71 @@
+"""Time from launching server.py until it answers, and until it exits on SIGTERM.
+
+Run from backend/ with the database up:
+
+    python -m benchmarks.cold_start --workers 4 --runs 3
+
+Each run starts `python server.py` on --port and polls GET / until it returns
+200. It then sends SIGTERM and waits for the process to exit. The workers'
+own "ready ... after launch" lines are in the server log on stderr.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import summarize
+
+
+def one_run(args) -> tuple[float, float]:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--workers", str(args.workers), "--port", str(args.port)],
+        env=os.environ | {"MAIL_DISPATCHER_ENABLED": "false"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        ready = time.perf_counter() - started
+        stopping = time.perf_counter()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+        return ready, time.perf_counter() - stopping
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+
+def main(args):
+    ready, shutdown = [], []
+    for _ in range(args.runs):
+        ready_seconds, shutdown_seconds = one_run(args)
+        ready.append(ready_seconds)
+        shutdown.append(shutdown_seconds)
+    print(json.dumps({
+        "workers": args.workers,
+        "first_response": summarize(ready),
+        "shutdown": summarize(shutdown),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--verbose", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,52 @@
+import sys
+from typing import Iterable
+
+import asyncpg
+
+from utils.password import get_password_hash
+
+
+RATE_LIMITED = (
+    "The server answered 429: start it with RATE_LIMIT_ENABLED=false to benchmark it"
+)
+
+
+def exit_if_rate_limited(statuses: Iterable[int]):
+    """The per-IP limits throttle any benchmark long before it saturates the
+    server, so a 429 means the run measured the wrong thing."""
+    if 429 in statuses:
+        sys.exit(RATE_LIMITED)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples, default=0.0) * 1000, 3),
+    }
+
+
+async def seed_verified_user(dsn: str, username: str, email: str, password: str):
+    query = """
+    INSERT INTO users (username, email, hashed_password, first_name, last_name, is_verified, is_active, created_at, updated_at)
+    SELECT $1::varchar, $2::varchar, $3, 'Bench', 'User', TRUE, TRUE, now(), now()
+    WHERE NOT EXISTS (
+        SELECT 1 FROM users WHERE username = $1::varchar OR email = $2::varchar
+    )
+    """
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(query, username, email, get_password_hash(password))
+    finally:
+        await conn.close()
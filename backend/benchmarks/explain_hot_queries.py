@@ -0,0 +1,140 @@
+"""Seed a large data set and report EXPLAIN ANALYZE latency of the hot auth queries.
+
+Run from backend/ against a scratch database that is migrated to head:
+
+    python -m benchmarks.explain_hot_queries --users 1000000 --tokens 10000000
+
+Seeding is skipped when the seed rows already exist, so later runs only
+re-measure. Write statements are explained inside a rolled back transaction.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import asyncpg
+
+from config.config import settings
+
+
+SEED_CHUNK = 500_000
+
+SEED_USERS = """
+INSERT INTO users (username, email, hashed_password, first_name, last_name, is_verified, is_active, created_at, updated_at)
+SELECT 'seed' || g, 'seed' || g || '@example.com', 'x', 'Seed', 'User', TRUE, TRUE, now(), now()
+FROM generate_series($1::int, $2::int) AS g
+"""
+SEED_VERIFICATIONS = """
+INSERT INTO email_verification (user_id, token_hash, is_used, expires_at, created_at)
+SELECT user_id, encode(sha256(convert_to('verify' || username, 'UTF8')), 'hex'), TRUE, now(), now()
+FROM users WHERE username LIKE 'seed%'
+"""
+# ~90% of historical tokens are revoked, like a long-lived rotation chain
+SEED_TOKENS = """
+INSERT INTO refresh_tokens (user_id, token, revoked, expires_at, created_at)
+SELECT u.user_id,
+       encode(sha256(convert_to('refresh' || g, 'UTF8')), 'hex'),
+       g % 10 <> 0,
+       now() + interval '7 days' - (g % 1000) * interval '1 minute',
+       now() - (g % 1000) * interval '1 minute'
+FROM generate_series($1::int, $2::int) AS g
+JOIN users u ON u.username = 'seed' || (g % $3::int + 1)
+"""
+
+QUERIES = {
+    "login_by_email": (
+        "SELECT user_id, email, username, first_name, last_name, is_active, is_verified, hashed_password FROM users WHERE email = $1",
+        lambda n: ["seed{}@example.com".format(n // 2)],
+    ),
+    "login_by_username": (
+        "SELECT user_id, email, username, first_name, last_name, is_active, is_verified, hashed_password FROM users WHERE username = $1",
+        lambda n: ["seed{}".format(n // 3)],
+    ),
+    "register_duplicate_check": (
+        "SELECT EXISTS (SELECT 1 FROM users WHERE email = $1) OR EXISTS (SELECT 1 FROM users WHERE username = $2)",
+        lambda n: ["nobody@example.com", "nobody"],
+    ),
+    "verification_lookup": (
+        "SELECT * FROM email_verification WHERE token_hash = encode(sha256(convert_to($1, 'UTF8')), 'hex')",
+        lambda n: ["verifyseed{}".format(n // 4)],
+    ),
+    "refresh_lookup": (
+        "SELECT refresh_id, user_id, revoked, expires_at FROM refresh_tokens WHERE token = encode(sha256(convert_to($1, 'UTF8')), 'hex') FOR UPDATE",
+        lambda n: ["refresh{}".format(n * 5)],
+    ),
+    "reuse_family_revoke": (
+        "UPDATE refresh_tokens SET revoked = TRUE WHERE user_id = (SELECT user_id FROM users WHERE username = $1) AND NOT revoked",
+        lambda n: ["seed{}".format(n // 5)],
+    ),
+    "sessions_first_page": (
+        "SELECT refresh_id, created_at FROM refresh_tokens WHERE user_id = (SELECT user_id FROM users WHERE username = $1) AND NOT revoked AND expires_at > now() AND (created_at, refresh_id) < ('infinity'::timestamp, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::uuid) ORDER BY created_at DESC, refresh_id DESC LIMIT 21",
+        lambda n: ["seed{}".format(n // 6)],
+    ),
+}
+
+
+def index_names(plan: dict) -> list[str]:
+    names = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        names += index_names(child)
+    return names
+
+
+async def seed(conn: asyncpg.Connection, users: int, tokens: int):
+    existing = await conn.fetchval(
+        "SELECT count(*) FROM users WHERE username LIKE 'seed%'"
+    )
+    if existing >= users:
+        print(f"seed users present ({existing}), skipping seeding")
+        return
+    start = time.perf_counter()
+    for low in range(1, users + 1, SEED_CHUNK):
+        await conn.execute(SEED_USERS, low, min(users, low + SEED_CHUNK - 1))
+    await conn.execute(SEED_VERIFICATIONS)
+    for low in range(1, tokens + 1, SEED_CHUNK):
+        await conn.execute(SEED_TOKENS, low, min(tokens, low + SEED_CHUNK - 1), users)
+        print(f"seeded {min(tokens, low + SEED_CHUNK - 1)} tokens")
+    await conn.execute("ANALYZE users, refresh_tokens, email_verification")
+    print(f"seeded in {time.perf_counter() - start:.1f}s")
+
+
+async def explain(conn: asyncpg.Connection, query: str, params: list) -> dict:
+    tr = conn.transaction()
+    await tr.start()
+    try:
+        raw = await conn.fetchval(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", *params
+        )
+    finally:
+        await tr.rollback()
+    result = json.loads(raw)[0]
+    return {
+        "planning_ms": result["Planning Time"],
+        "execution_ms": result["Execution Time"],
+        "root_node": result["Plan"]["Node Type"],
+        "indexes": index_names(result["Plan"]),
+    }
+
+
+async def main(args):
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        await seed(conn, args.users, args.tokens)
+        report = {"users": args.users, "tokens": args.tokens, "queries": {}}
+        for name, (query, params) in QUERIES.items():
+            runs = [await explain(conn, query, params(args.users)) for _ in range(args.repeat)]
+            best = min(runs, key=lambda run: run["execution_ms"])
+            report["queries"][name] = best
+    finally:
+        await conn.close()
+    report["measured_at"] = datetime.now().isoformat(timespec="seconds")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--tokens", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
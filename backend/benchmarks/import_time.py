@@ -0,0 +1,127 @@
+"""Import cost of each entry point, checked against a committed budget.
+
+Run from backend/:
+
+    python -m benchmarks.import_time            # report
+    python -m benchmarks.import_time --check    # exit 1 on a regression
+    python -m benchmarks.import_time --update   # rewrite the budget file
+
+Each target is imported in a fresh interpreter under `python -X importtime`
+and timed from the cumulative time of its top-level imports (median of
+--runs). --check fails if a target takes more than --tolerance times its
+budget in import_budget.json, or loads a module it must not need; for
+instance the migration runner must not pull in FastAPI, and the web app
+must leave the mail stack to the processes that send mail. It also fails if
+importing the web app builds the settings: they are read on first use, so
+the process manager can adjust the environment after the import. The
+migrations target runs with DATABASE_URL as its only setting.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+BUDGET_FILE = Path(__file__).parent / "import_budget.json"
+
+TARGETS = {
+    "app": {
+        "code": "import main",
+        "forbidden": ["jinja2", "aiosmtplib", "sqlalchemy", "alembic"],
+        "lazy_settings": True,
+    },
+    "settings": {
+        "code": "from config.config import settings; settings.TOKEN_ALGORITHM",
+        "forbidden": ["fastapi", "asyncpg", "jwt"],
+    },
+    "migrations": {
+        "code": "from config.config import get_database_settings; get_database_settings()",
+        "forbidden": ["fastapi", "asyncpg", "jwt", "jinja2", "aiosmtplib"],
+        "env": ["DATABASE_URL"],
+    },
+}
+
+
+# printed by a lazy_settings target after its import: 1 if the settings were built
+SETTINGS_BUILT = (
+    "; from config.config import get_settings; print(get_settings.cache_info().currsize)"
+)
+
+
+def measure(target: dict) -> tuple[float, set[str], bool]:
+    env = os.environ.copy()
+    if "env" in target:
+        env = {
+            name: value
+            for name, value in env.items()
+            if name in target["env"] or name in ("PATH", "HOME", "PYTHONPATH")
+        }
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            target["code"] + (SETTINGS_BUILT if target.get("lazy_settings") else ""),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        # top-level imports start right after the column separator
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+    return total_us / 1000, modules, result.stdout.strip() not in ("", "0")
+
+
+def main(args):
+    budget = json.loads(BUDGET_FILE.read_text()) if BUDGET_FILE.exists() else {}
+    report, failures = {}, []
+    for name, target in TARGETS.items():
+        samples, modules = [], set()
+        for _ in range(args.runs):
+            ms, modules, settings_built = measure(target)
+            samples.append(ms)
+        ms = round(statistics.median(samples), 1)
+        loaded = sorted(
+            forbidden
+            for forbidden in target["forbidden"]
+            if forbidden in modules or any(m.startswith(forbidden + ".") for m in modules)
+        )
+        report[name] = {"ms": ms, "budget_ms": budget.get(name), "forbidden_loaded": loaded}
+        if target.get("lazy_settings"):
+            report[name]["settings_built"] = settings_built
+            if settings_built:
+                failures.append(f"{name} builds the settings at import")
+        if loaded:
+            failures.append(f"{name} imports {', '.join(loaded)}")
+        if name in budget and ms > budget[name] * args.tolerance:
+            failures.append(f"{name} took {ms} ms, budget {budget[name]} ms")
+    print(json.dumps(report, indent=2))
+    if args.update:
+        BUDGET_FILE.write_text(
+            json.dumps({name: result["ms"] for name, result in report.items()}, indent=2)
+            + "\n"
+        )
+    if args.check and failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--update", action="store_true")
+    main(parser.parse_args())
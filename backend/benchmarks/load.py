@@ -0,0 +1,369 @@
+"""Reproducible load test of the auth endpoints, with a baseline to compare against.
+
+Run from backend/ with Postgres up (docker-compose `db`) and migrated:
+
+    python -m benchmarks.load --users 200 --concurrency 20 --duration 30 \\
+        --mix login=10,me=70,refresh=15,register=4,verify=1 --output run.json
+    python -m benchmarks.load --baseline benchmarks/baselines/load.json
+    python -m benchmarks.load --tier micro --baseline benchmarks/baselines/load.json
+
+The load tier does the following:
+- starts an in-process SMTP sink;
+- seeds --users verified users, hashing one password once for all of them;
+- boots `server.py` with mail pointed at the sink and rate limiting off;
+- drives the mix from --concurrency virtual users for --duration seconds,
+  after --warmup seconds that are not recorded.
+
+Each virtual user logs in as its own seeded user and keeps its cookies.
+"register" creates fresh accounts. "verify" consumes the verification links
+the sink received, and becomes a "me" when none is waiting. With
+--base-url the harness targets a server that is already running instead;
+that server must send mail to --smtp-port.
+
+The micro tier times utils/tokens and utils/password in-process.
+
+Results go to --output as JSON: req/s and p50/p95/p99 per endpoint, and
+ops/s per micro benchmark. With --baseline, the run fails (exit 1) when
+req/s or ops/s drop, or p95 rises, by more than --tolerance relative to
+the stored numbers. Random choices use --seed, so a run is repeatable for
+a given seed and machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import asyncpg
+import httpx
+
+from benchmarks.common import summarize
+from benchmarks.smtp_sink import SMTPSink
+from config.config import settings
+
+
+PASSWORD = "Load#Password1"
+DEFAULT_MIX = "login=10,me=70,refresh=15,register=4,verify=1"
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("login", "me", "refresh", "register", "verify"):
+            raise SystemExit(f"unknown endpoint in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def seed_users(prefix: str, count: int) -> list[str]:
+    from utils.password import get_password_hash
+
+    usernames = [f"{prefix}{i}" for i in range(count)]
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        await conn.execute(
+            """
+            INSERT INTO users (username, email, hashed_password, first_name, last_name,
+                               is_verified, is_active, created_at, updated_at)
+            SELECT u, u || '@example.com', $2, 'Load', 'User', TRUE, TRUE, now(), now()
+            FROM unnest($1::varchar[]) AS u
+            ON CONFLICT DO NOTHING
+            """,
+            usernames,
+            get_password_hash(PASSWORD),
+        )
+    finally:
+        await conn.close()
+    return usernames
+
+
+async def cleanup(prefix: str):
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        async with conn.transaction():
+            users = "SELECT user_id FROM users WHERE username LIKE $1"
+            await conn.execute(f"DELETE FROM refresh_tokens WHERE user_id IN ({users})", prefix + "%")
+            await conn.execute(f"DELETE FROM email_verification WHERE user_id IN ({users})", prefix + "%")
+            await conn.execute("DELETE FROM users WHERE username LIKE $1", prefix + "%")
+    finally:
+        await conn.close()
+
+
+def boot_server(args, smtp_port: int) -> subprocess.Popen:
+    env = os.environ | {
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": str(smtp_port),
+        "MAIL_TLS": "false",
+        "MAIL_SSL": "false",
+        "USE_CREDENTIALS": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "SERVER_ACCESS_LOG": "false",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--workers", str(args.workers), "--port", str(args.port)],
+        cwd=BACKEND,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.verbose else subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited with {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    server.kill()
+    raise SystemExit("server did not come up within 60s")
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, username: str, run: "LoadRun"):
+        self.client = client
+        self.username = username
+        self.run = run
+        self.access_token = None
+        self.refresh_token = None
+
+    def _keep_tokens(self, response: httpx.Response):
+        if response.status_code == 200:
+            self.access_token = response.json().get("access_token")
+            self.refresh_token = response.cookies.get("refresh_token")
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post(
+            "/login", json={"username": self.username, "password": PASSWORD}
+        )
+        self._keep_tokens(response)
+        return response
+
+    async def me(self) -> httpx.Response:
+        if self.access_token is None:
+            await self.login()
+        return await self.client.get("/users/me", cookies={"access_token": self.access_token})
+
+    async def refresh(self) -> httpx.Response:
+        if self.refresh_token is None:
+            await self.login()
+        response = await self.client.post(
+            "/refresh", cookies={"refresh_token": self.refresh_token}
+        )
+        self._keep_tokens(response)
+        return response
+
+    async def register(self) -> httpx.Response:
+        name = f"{self.run.prefix}r{next(self.run.registrations)}"
+        return await self.client.post("/register", json={
+            "username": name,
+            "email": f"{name}@example.com",
+            "first_name": "Load",
+            "last_name": "User",
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+        })
+
+    async def verify(self) -> httpx.Response:
+        return await self.client.get("/verify_email", params={"token": self.run.sink.tokens.pop()})
+
+
+class LoadRun:
+    def __init__(self, args, prefix: str, sink: SMTPSink):
+        self.args = args
+        self.prefix = prefix
+        self.sink = sink
+        self.weights = parse_mix(args.mix)
+        self.registrations = iter(range(10**9))
+        self.recording = False
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def user_loop(self, user: VirtualUser, rng: random.Random, stop_at: float):
+        names, weights = list(self.weights), list(self.weights.values())
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            if name == "verify" and not self.sink.tokens:
+                name = "me"
+            started = time.perf_counter()
+            try:
+                response = await getattr(user, name)()
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 0
+            if self.recording:
+                self.samples[name].append(time.perf_counter() - started)
+                self.statuses[name][status] += 1
+                if not 200 <= status < 300:
+                    self.errors[name] += 1
+
+    async def drive(self, base_url: str, usernames: list[str]) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            users = [
+                VirtualUser(client, usernames[i % len(usernames)], self)
+                for i in range(self.args.concurrency)
+            ]
+            rngs = [random.Random(self.args.seed + i) for i in range(len(users))]
+            warmup_until = time.perf_counter() + self.args.warmup
+            stop_at = warmup_until + self.args.duration
+            tasks = [
+                asyncio.create_task(self.user_loop(user, rng, stop_at))
+                for user, rng in zip(users, rngs)
+            ]
+            await asyncio.sleep(max(0.0, warmup_until - time.perf_counter()))
+            self.recording = True
+            recording_started = time.perf_counter()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - recording_started
+        endpoints = {}
+        for name, samples in sorted(self.samples.items()):
+            endpoints[name] = {
+                "requests_per_second": round(len(samples) / elapsed, 1),
+                "errors": self.errors[name],
+                "statuses": dict(self.statuses[name]),
+            } | summarize(samples)
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            "requests_per_second": round(total / elapsed, 1),
+            "endpoints": endpoints,
+            "emails_received": self.sink.messages,
+        }
+
+
+async def load_tier(args) -> dict:
+    prefix = f"load{uuid.uuid4().hex[:6]}"
+    sink = SMTPSink()
+    await sink.start(port=args.smtp_port)
+    server = None
+    try:
+        usernames = await seed_users(prefix, args.users)
+        base_url = args.base_url
+        if base_url is None:
+            server = await asyncio.to_thread(boot_server, args, sink.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+        return await LoadRun(args, prefix, sink).drive(base_url, usernames)
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            await asyncio.to_thread(server.wait, 60)
+        await sink.stop()
+        if args.cleanup:
+            await cleanup(prefix)
+
+
+def ops_per_second(func, calls: int) -> float:
+    durations = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return round(1 / statistics.median(durations), 1)
+
+
+def micro_tier(args) -> dict:
+    from utils.password import get_password_hash, verify_password
+    from utils.tokens import create_engine, decode_token, generate_token
+
+    claims = {"user_id": str(uuid.uuid4())}
+    token = generate_token(claims)
+    uncached = create_engine()
+    uncached.cache_size = 0
+    hashed = get_password_hash(PASSWORD)
+    calls = args.micro_calls
+    return {
+        "jwt_sign": ops_per_second(lambda: generate_token(claims), calls),
+        "jwt_verify_cached": ops_per_second(lambda: decode_token(token), calls),
+        "jwt_verify_uncached": ops_per_second(lambda: uncached.decode(token), calls),
+        "password_hash": ops_per_second(lambda: get_password_hash(PASSWORD), args.hash_calls),
+        "password_verify": ops_per_second(
+            lambda: verify_password(PASSWORD, hashed), args.hash_calls
+        ),
+    }
+
+
+def regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for name, current in result.get("load", {}).get("endpoints", {}).items():
+        stored = baseline.get("load", {}).get("endpoints", {}).get(name)
+        if not stored:
+            continue
+        if current["requests_per_second"] < stored["requests_per_second"] * (1 - tolerance):
+            found.append(
+                f"{name}: {current['requests_per_second']} req/s, "
+                f"baseline {stored['requests_per_second']}"
+            )
+        if current["p95_ms"] > stored["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {current['p95_ms']} ms, baseline {stored['p95_ms']}")
+    for name, current in result.get("micro", {}).items():
+        stored = baseline.get("micro", {}).get(name)
+        if current and stored and current < stored * (1 - tolerance):
+            found.append(f"{name}: {current} ops/s, baseline {stored}")
+    return found
+
+
+async def main(args):
+    result = {
+        "meta": {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+        }
+    }
+    if args.tier in ("micro", "all"):
+        result["micro"] = micro_tier(args)
+    if args.tier in ("load", "all"):
+        result["load"] = await load_tier(args)
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("meta", {}).get("cpus") != os.cpu_count():
+            print("warning: the baseline was recorded with a different CPU count", file=sys.stderr)
+        found = regressions(result, baseline, args.tolerance)
+        if found:
+            print("\n".join(found), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--tier", choices=["load", "micro", "all"], default="all")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--smtp-port", type=int, default=0)
+    parser.add_argument("--base-url")
+    parser.add_argument("--micro-calls", type=int, default=20_000)
+    parser.add_argument("--hash-calls", type=int, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--cleanup", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(main(parser.parse_args()))
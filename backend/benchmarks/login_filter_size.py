@@ -0,0 +1,69 @@
+"""Memory and false-positive rate of the login Bloom filter for a large users table.
+
+Run from backend/ (no database needed, logins are synthetic):
+
+    python -m benchmarks.login_filter_size --users 10000000
+
+Each user contributes a username and an email, sized with the same rule the
+server uses at startup. The false-positive rate is measured by probing logins
+that were never added, and compared with a plain Python set holding the same
+strings, estimated from a sample.
+"""
+import argparse
+import json
+import sys
+import time
+
+from config.config import settings
+from utils.bloom import BloomFilter
+
+
+def logins(start: int, stop: int):
+    for i in range(start, stop):
+        yield f"user{i}"
+        yield f"user{i}@example.com"
+
+
+def set_bytes_estimate(users: int) -> int:
+    sample = 100_000
+    items = set(logins(0, sample))
+    per_user = (sys.getsizeof(items) + sum(sys.getsizeof(item) for item in items)) / sample
+    return round(per_user * users)
+
+
+def main(args):
+    bloom = BloomFilter(2 * args.users, args.fp_rate)
+    started = time.perf_counter()
+    for login in logins(0, args.users):
+        bloom.add(login)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    false_positives = sum(
+        f"missing{i}@example.com" in bloom for i in range(args.probes)
+    )
+    lookup_seconds = (time.perf_counter() - started) / args.probes
+    misses = [login for login in logins(0, min(args.users, 10_000)) if login not in bloom]
+    print(json.dumps({
+        "users": args.users,
+        "entries": bloom.count,
+        "bits": bloom.size,
+        "hash_functions": bloom.hashes,
+        "memory_bytes": len(bloom.bits),
+        "memory_mib": round(len(bloom.bits) / 2**20, 1),
+        "set_memory_mib_estimate": round(set_bytes_estimate(args.users) / 2**20, 1),
+        "target_fp_rate": args.fp_rate,
+        "expected_fp_rate": round(bloom.expected_fp_rate(), 6),
+        "measured_fp_rate": round(false_positives / args.probes, 6),
+        "false_negatives": len(misses),
+        "build_seconds": round(build_seconds, 1),
+        "lookup_us": round(lookup_seconds * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000_000)
+    parser.add_argument("--fp-rate", type=float, default=settings.USER_FILTER_FP_RATE)
+    parser.add_argument("--probes", type=int, default=1_000_000)
+    main(parser.parse_args())
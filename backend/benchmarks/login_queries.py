@@ -0,0 +1,88 @@
+"""Logins/sec of the database side of /login, before and after the slim path.
+
+Password verification is left out so the numbers isolate pool checkouts and
+round trips. Run from backend/ with DATABASE_URL pointing at a scratch DB:
+
+    python -m benchmarks.login_queries --concurrency 32 --duration 10
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from benchmarks.common import seed_verified_user, summarize
+from config.config import settings
+
+
+USERNAME = "benchlogin"
+EMAIL = "benchlogin@example.com"
+
+LEGACY_LOOKUP = "SELECT * FROM users WHERE username = $1 OR email = $1"
+LEGACY_INSERT = """
+INSERT INTO refresh_tokens (user_id, token, expires_at, created_at)
+VALUES ($1, $2, $3, $4)
+"""
+SLIM_LOOKUP = """
+SELECT user_id, email, username, first_name, last_name, is_active, is_verified, hashed_password
+FROM users WHERE username = $1 OR email = $1
+"""
+COMBINED_INSERT = """
+WITH touched AS (
+    UPDATE users SET last_login = $4 WHERE user_id = $1
+)
+INSERT INTO refresh_tokens (user_id, token, expires_at, created_at)
+VALUES ($1, $2, $3, $4)
+"""
+
+
+async def login_once(pool: asyncpg.Pool, lookup: str, insert: str):
+    async with pool.acquire() as conn:
+        user = await conn.fetchrow(lookup, USERNAME)
+    token = hashlib.sha256(uuid.uuid4().bytes).hexdigest()
+    now = datetime.now()
+    async with pool.acquire() as conn:
+        await conn.execute(insert, user["user_id"], token, now + timedelta(days=7), now)
+
+
+async def run(pool: asyncpg.Pool, lookup: str, insert: str, args) -> dict:
+    samples: list[float] = []
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await login_once(pool, lookup, insert)
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return {"logins_per_sec": round(len(samples) / args.duration, 1)} | summarize(
+        samples
+    )
+
+
+async def main(args):
+    await seed_verified_user(settings.DATABASE_URL, USERNAME, EMAIL, "Bench#Login1")
+    pool = await asyncpg.create_pool(
+        settings.DATABASE_URL, min_size=args.pool_size, max_size=args.pool_size
+    )
+    try:
+        report = {
+            "before": await run(pool, LEGACY_LOOKUP, LEGACY_INSERT, args),
+            "after": await run(pool, SLIM_LOOKUP, COMBINED_INSERT, args),
+        }
+    finally:
+        await pool.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-size", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
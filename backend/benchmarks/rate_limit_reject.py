@@ -0,0 +1,86 @@
+"""CPU cost of rejecting throttled logins, and of tracking many distinct clients.
+
+Run from backend/:
+
+    python -m benchmarks.rate_limit_reject --rps 50000
+
+"reject" repeatedly throttles one client that is over its limit, which is
+the credential-stuffing case; "distinct_clients" hits a new IP every time so
+the LRU keeps evicting. cpu_share_at_rps is the fraction of one core the
+limiter would use at --rps requests per second. With --backend postgres the
+shared backend is measured instead and needs a migrated database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from database.connection_db import connection
+from utils.rate_limit import (
+    MemoryRateLimitBackend,
+    PostgresRateLimitBackend,
+    RateLimiter,
+)
+
+
+def request(ip: str) -> Request:
+    return Request({"type": "http", "headers": [], "client": (ip, 40000)})
+
+
+async def measure(limiter: RateLimiter, requests: list[Request], account: str) -> float:
+    started = time.perf_counter()
+    for req in requests:
+        try:
+            await limiter.check(req, "login", 30, account=account, account_limit=10)
+        except HTTPException:
+            pass
+    return (time.perf_counter() - started) / len(requests)
+
+
+def report(per_call: float, rps: int) -> dict:
+    return {
+        "us_per_request": round(per_call * 1e6, 3),
+        "requests_per_second": round(1 / per_call),
+        "cpu_share_at_rps": round(per_call * rps, 4),
+    }
+
+
+async def main(args):
+    os.environ["RATE_LIMIT_ENABLED"] = "true"
+    if args.backend == "postgres":
+        await connection.init_connection()
+        backend = PostgresRateLimitBackend()
+    else:
+        backend = MemoryRateLimitBackend(args.max_keys)
+    limiter = RateLimiter(backend, 60.0)
+    try:
+        attacker = [request("203.0.113.7")] * args.requests
+        await measure(limiter, attacker[:100], "victim")
+        results = {"reject": report(await measure(limiter, attacker, "victim"), args.rps)}
+        clients = [
+            request(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+            for i in range(args.requests)
+        ]
+        results["distinct_clients"] = report(
+            await measure(limiter, clients, None), args.rps
+        )
+    finally:
+        if args.backend == "postgres":
+            await connection.close_connection()
+    results["rejected"] = limiter.rejected
+    results["backend"] = args.backend
+    results |= backend.stats()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--rps", type=int, default=50_000)
+    parser.add_argument("--max-keys", type=int, default=100_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""Fire many concurrent refreshes of one token and check exactly one rotates.
+
+Run from backend/ with DATABASE_URL pointing at a scratch DB:
+
+    python -m benchmarks.refresh_race --parallel 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import asyncpg
+from fastapi import HTTPException
+
+from benchmarks.common import seed_verified_user
+from config.config import settings
+from database.queries import RegistryConnection
+from services.auth import auth
+
+
+USERNAME = "benchrefresh"
+EMAIL = "benchrefresh@example.com"
+
+
+async def main(args):
+    await seed_verified_user(settings.DATABASE_URL, USERNAME, EMAIL, "Bench#Refresh1")
+    pool = await asyncpg.create_pool(
+        settings.DATABASE_URL,
+        min_size=args.pool_size,
+        max_size=args.pool_size,
+        connection_class=RegistryConnection,
+        init=RegistryConnection.prepare_registry,
+    )
+    try:
+        async with pool.acquire() as conn:
+            user_id = await conn.fetchval(
+                "SELECT user_id FROM users WHERE username = $1", USERNAME
+            )
+        tokens = await auth.generate_and_store_tokens(str(user_id), pool)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                auth.rotate_refresh_token(tokens["refresh_token"], pool)
+                for _ in range(args.parallel)
+            ),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        await pool.close()
+
+    succeeded = [r for r in results if isinstance(r, dict)]
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    unexpected = [r for r in results if r not in succeeded and r not in rejected]
+    print(
+        json.dumps(
+            {
+                "parallel": args.parallel,
+                "succeeded": len(succeeded),
+                "rejected": len(rejected),
+                "unexpected": [repr(r) for r in unexpected],
+                "elapsed_ms": round(elapsed * 1000, 3),
+            },
+            indent=2,
+        )
+    )
+    if len(succeeded) != 1 or unexpected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parallel", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,124 @@
+"""Registrations per second, and duplicate registrations racing each other.
+
+Run from backend/ against a running server and its database. Start the
+server with RATE_LIMIT_ENABLED=false, or the per-IP register limit answers
+429 instead of the outcomes measured here:
+
+    python -m benchmarks.register_load --base-url http://localhost:8000 --users 200
+
+The throughput phase registers --users distinct accounts with --concurrency
+requests in flight. The race phase fires --racers registrations that share
+one email (and, separately, one username) at the same time; exactly one of
+each must succeed and exactly one row must exist afterwards. The script exits
+non-zero otherwise.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+import asyncpg
+import httpx
+
+from benchmarks.common import exit_if_rate_limited, summarize
+from config.config import settings
+
+
+PASSWORD = "Bench#Register1"
+
+
+def payload(username: str, email: str) -> dict:
+    return {
+        "username": username,
+        "email": email,
+        "first_name": "Bench",
+        "last_name": "User",
+        "password": PASSWORD,
+        "confirm_password": PASSWORD,
+    }
+
+
+async def register(client: httpx.AsyncClient, body: dict, samples: list) -> int:
+    started = time.perf_counter()
+    response = await client.post("/register", json=body)
+    samples.append(time.perf_counter() - started)
+    return response.status_code
+
+
+async def throughput(client: httpx.AsyncClient, args, run: str) -> dict:
+    samples, statuses = [], []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            name = f"r{run}{i}"
+            statuses.append(
+                await register(client, payload(name, f"{name}@example.com"), samples)
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+    exit_if_rate_limited(statuses)
+    return {
+        "registered": statuses.count(200),
+        "errors": len(statuses) - statuses.count(200),
+        "per_second": round(statuses.count(200) / elapsed, 1),
+        "latency": summarize(samples),
+    }
+
+
+async def race(client: httpx.AsyncClient, args, run: str, shared: str) -> dict:
+    samples = []
+    bodies = []
+    for i in range(args.racers):
+        username = f"x{run}{i}" if shared == "email" else f"x{run}"
+        email = f"x{run}@example.com" if shared == "email" else f"x{run}{i}@example.com"
+        bodies.append(payload(username, email))
+    statuses = await asyncio.gather(*(register(client, body, samples) for body in bodies))
+    exit_if_rate_limited(statuses)
+    return {
+        "shared": shared,
+        "succeeded": statuses.count(200),
+        "rejected": statuses.count(403),
+        "other": [code for code in statuses if code not in (200, 403)],
+    }
+
+
+async def main(args):
+    run = uuid.uuid4().hex[:6]
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.racers))
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        report = {"throughput": await throughput(client, args, run)}
+        report["races"] = [
+            await race(client, args, run + "e", "email"),
+            await race(client, args, run + "u", "username"),
+        ]
+    conn = await asyncpg.connect(settings.DATABASE_URL)
+    try:
+        rows = await conn.fetchval(
+            "SELECT count(*) FROM users WHERE email = $1 OR username = $2",
+            f"x{run}e@example.com",
+            f"x{run}u",
+        )
+    finally:
+        await conn.close()
+    report["race_rows"] = rows
+    print(json.dumps(report, indent=2))
+    ok = rows == 2 and all(
+        r["succeeded"] == 1 and not r["other"] for r in report["races"]
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--racers", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""Verification emails rendered per second, per rendering strategy.
+
+Run from backend/:
+
+    python -m benchmarks.render_templates --seconds 3
+
+"per_message_jinja" compiles the template on every message, like the old
+per-request fastapi-mail path did; "compiled_jinja" renders a template
+compiled once; "segments" joins the pre-rendered static segments.
+"""
+import argparse
+import json
+import time
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from utils.templates import TEMPLATE_FOLDER, TemplateRenderer
+
+
+TEMPLATE = "verify.html"
+
+
+def context(i: int) -> dict:
+    return {
+        "receiver": f"user{i}<&>",
+        "app_name": "Touch Somebody",
+        "verification_link": f"http://localhost:8000/verify_email?token=tok{i}",
+    }
+
+
+def per_message_jinja(i: int) -> str:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_FOLDER),
+        autoescape=select_autoescape(["html"]),
+    )
+    return env.get_template(TEMPLATE).render(**context(i))
+
+
+def measure(render, seconds: float) -> dict:
+    rendered = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        render(rendered)
+        rendered += 1
+    elapsed = time.perf_counter() - started
+    return {"rendered": rendered, "per_second": round(rendered / elapsed)}
+
+
+def main(args):
+    compiled = TemplateRenderer()
+    compiled.load()
+    compiled.segments.clear()
+    segmented = TemplateRenderer()
+    segmented.load()
+    if TEMPLATE not in segmented.segments:
+        raise SystemExit(f"{TEMPLATE} has no pre-rendered segments")
+    for i in range(3):
+        expected = per_message_jinja(i)
+        assert compiled.render(TEMPLATE, context(i)) == expected
+        assert segmented.render(TEMPLATE, context(i)) == expected
+    report = {
+        "per_message_jinja": measure(per_message_jinja, args.seconds),
+        "compiled_jinja": measure(
+            lambda i: compiled.render(TEMPLATE, context(i)), args.seconds
+        ),
+        "segments": measure(
+            lambda i: segmented.render(TEMPLATE, context(i)), args.seconds
+        ),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    main(parser.parse_args())
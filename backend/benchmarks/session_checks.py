@@ -0,0 +1,119 @@
+"""Regression checks for sign-out and session listing; exits 1 on a failure.
+
+Run from backend/:
+
+    python -m benchmarks.session_checks
+    python -m benchmarks.session_checks --check same_second_login
+
+same_second_login needs no settings or database: a token issued right after
+a logout-all, in the same second, must not be caught by it, while one issued
+before must be. legacy_session lists the sessions of a user holding a
+refresh row from before session metadata (no signed_in_at); it needs
+DATABASE_URL pointing at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from benchmarks.common import seed_verified_user
+from config.config import get_database_settings
+from database.queries import RegistryConnection
+from services.sessions import sessions
+from utils.revocation import RevocationSet
+from utils.tokens import TokenEngine, get_hash_token
+
+
+USER_ID = "4b1d1a52-3f0e-4c55-9a59-1f2b8e0f6c10"
+USERNAME = "benchsessions"
+EMAIL = "benchsessions@example.com"
+
+INSERT_LEGACY_SESSION = """
+INSERT INTO refresh_tokens (user_id, token, expires_at, created_at)
+VALUES ($1, $2, $3, $4)
+RETURNING refresh_id
+"""
+
+
+def same_second_login() -> dict:
+    engine = TokenEngine("HS256", "bench-secret" * 3)
+    revoked_users = RevocationSet(15 * 60)
+
+    def issue() -> float:
+        token = engine.encode({"sub": USER_ID}, expires_in=timedelta(minutes=15))
+        return engine.decode(token, cache=False)["iat"]
+
+    before = issue()
+    # the revocation time SessionService.logout_all records
+    revoked_users.revoke(USER_ID, datetime.now().timestamp())
+    after = issue()
+    return {
+        "ok": revoked_users.is_revoked(USER_ID, before)
+        and not revoked_users.is_revoked(USER_ID, after),
+        "issued_before_revoked": revoked_users.is_revoked(USER_ID, before),
+        "issued_after_revoked": revoked_users.is_revoked(USER_ID, after),
+    }
+
+
+async def legacy_session() -> dict:
+    dsn = get_database_settings().DATABASE_URL
+    await seed_verified_user(dsn, USERNAME, EMAIL, "Bench#Sessions1")
+    pool = await asyncpg.create_pool(
+        dsn,
+        min_size=1,
+        max_size=1,
+        connection_class=RegistryConnection,
+        init=RegistryConnection.prepare_registry,
+    )
+    try:
+        async with pool.acquire() as conn:
+            user_id = await conn.fetchval(
+                "SELECT user_id FROM users WHERE username = $1", USERNAME
+            )
+            created_at = datetime.now()
+            refresh_id = await conn.fetchval(
+                INSERT_LEGACY_SESSION,
+                user_id,
+                get_hash_token(uuid.uuid4().hex),
+                created_at + timedelta(days=1),
+                created_at,
+            )
+        try:
+            page = await sessions.list_sessions(str(user_id), 50, db_pool=pool)
+        except Exception as e:
+            return {"ok": False, "error": repr(e)}
+        finally:
+            async with pool.acquire() as conn:
+                await conn.execute("DELETE FROM refresh_tokens WHERE refresh_id = $1", refresh_id)
+    finally:
+        await pool.close()
+    listed = [s for s in page.sessions if s.session_id == str(refresh_id)]
+    return {
+        "ok": len(listed) == 1 and listed[0].signed_in_at == created_at,
+        "listed": len(listed),
+        "signed_in_at": listed[0].signed_in_at.isoformat() if listed else None,
+    }
+
+
+CHECKS = {"same_second_login": same_second_login, "legacy_session": legacy_session}
+
+
+async def main(args):
+    report = {}
+    for name in args.checks or CHECKS:
+        result = CHECKS[name]()
+        report[name] = await result if asyncio.iscoroutine(result) else result
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all(result["ok"] for result in report.values()) else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--check", dest="checks", action="append", choices=sorted(CHECKS), help="default: all"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""In-process SMTP server that accepts every message and keeps verification tokens.
+
+Used by benchmarks.load so a run needs no mail server; it speaks just enough
+SMTP (no TLS, no AUTH) for aiosmtplib with MAIL_TLS, MAIL_SSL and
+USE_CREDENTIALS turned off.
+"""
+import asyncio
+import re
+from email import message_from_bytes, policy
+
+
+TOKEN_PATTERN = re.compile(r"verify_email\?token=([A-Za-z0-9_-]+)")
+
+
+class SMTPSink:
+    def __init__(self):
+        self.server: asyncio.AbstractServer | None = None
+        self.port = 0
+        self.messages = 0
+        self.tokens: list[str] = []
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self._session, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"220 sink ESMTP\r\n")
+        try:
+            while line := await reader.readline():
+                command = line[:4].upper()
+                if command == b"EHLO":
+                    writer.write(b"250-sink\r\n250 8BITMIME\r\n")
+                elif command == b"DATA":
+                    writer.write(b"354 end with .\r\n")
+                    await writer.drain()
+                    self._received(await reader.readuntil(b"\r\n.\r\n"))
+                    writer.write(b"250 queued\r\n")
+                elif command == b"QUIT":
+                    writer.write(b"221 bye\r\n")
+                    await writer.drain()
+                    break
+                else:
+                    # HELO, MAIL, RCPT, RSET, NOOP
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _received(self, data: bytes):
+        self.messages += 1
+        # undo dot-stuffing, then let the email package decode the body
+        raw = data[: -len(b"\r\n.\r\n")].replace(b"\r\n..", b"\r\n.")
+        message = message_from_bytes(raw, policy=policy.default)
+        body = message.get_body(("html", "plain"))
+        match = TOKEN_PATTERN.search(body.get_content() if body else "")
+        if match:
+            self.tokens.append(match.group(1))
@@ -0,0 +1,70 @@
+"""Check that registry statements survive pool checkouts; exits 1 on a failure.
+
+Run from backend/ with DATABASE_URL pointing at a migrated database:
+
+    python -m benchmarks.statement_checks
+
+RegistryConnection hands out a fresh handle to each statement it prepared
+when the connection opened, built from asyncpg internals that asyncpg does
+not promise to keep. requirement.txt pins asyncpg exactly; run this after
+changing that pin. It makes every kind of named call across several
+checkouts of one pooled connection, and fails if any raises or if the server
+ends up with more prepared statements than the registry holds, which would
+mean statements are being prepared again.
+"""
+import asyncio
+import json
+import sys
+import uuid
+from datetime import datetime
+
+import asyncpg
+
+from config.config import get_database_settings
+from database.queries import STATEMENTS, RegistryConnection
+
+
+CHECKOUTS = 3
+
+
+async def named_calls(conn: RegistryConnection):
+    missing = str(uuid.uuid4())
+    await conn.fetchval_named("estimate_users")
+    await conn.fetchrow_named("user_by_id", missing)
+    await conn.fetch_named("recent_revocations", datetime.now())
+    await conn.execute_named("rehash_password", missing, "", "")
+    async with conn.transaction():
+        async for _ in await conn.cursor_named("users_created_since", datetime.now(), prefetch=10):
+            pass
+
+
+async def main():
+    pool = await asyncpg.create_pool(
+        get_database_settings().DATABASE_URL,
+        min_size=1,
+        max_size=1,
+        connection_class=RegistryConnection,
+        # plain queries go unnamed, so only the registry is in pg_prepared_statements
+        statement_cache_size=0,
+        init=RegistryConnection.prepare_registry,
+    )
+    report = {"asyncpg": asyncpg.__version__, "registry": len(STATEMENTS)}
+    try:
+        for _ in range(CHECKOUTS):
+            async with pool.acquire() as conn:
+                await named_calls(conn)
+        async with pool.acquire() as conn:
+            report["prepared_on_server"] = await conn.fetchval(
+                "SELECT count(*) FROM pg_prepared_statements"
+            )
+        report["ok"] = report["prepared_on_server"] == len(STATEMENTS)
+    except Exception as e:
+        report |= {"ok": False, "error": repr(e)}
+    finally:
+        await pool.close()
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Tokens signed and verified per second on one core, per algorithm.
+
+Run from backend/ (keys are generated on the fly, no database needed):
+
+    python -m benchmarks.token_throughput --seconds 2
+
+"pyjwt" is the previous per-call path: jwt.encode/jwt.decode with the raw
+secret or PEM. "engine" is TokenEngine with prepared keys and the header
+serialized once; "engine_cached" verifies the same access token repeatedly,
+which is what every authenticated request after the first one does.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from utils.tokens import TokenEngine
+
+
+SECRET = "bench-secret-0123456789abcdef0123456789"
+CLAIMS = {"user_id": "5f0c6f0e-8a52-4c39-a6a4-0b8f7b9f6d11"}
+
+
+def pem(private_key) -> bytes:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def keys(algorithm: str):
+    if algorithm == "EdDSA":
+        return pem(ed25519.Ed25519PrivateKey.generate())
+    if algorithm == "ES256":
+        return pem(ec.generate_private_key(ec.SECP256R1()))
+    return None
+
+
+def per_second(func, seconds: float) -> float:
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            func()
+        calls += 100
+    return round(calls / (time.perf_counter() - started))
+
+
+def pyjwt(algorithm: str, private_pem, seconds: float) -> dict:
+    if private_pem is None:
+        signing_key = verifying_key = SECRET
+    else:
+        signing_key = private_pem.decode()
+        verifying_key = (
+            serialization.load_pem_private_key(private_pem, None)
+            .public_key()
+            .public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode()
+        )
+
+    def sign():
+        now = datetime.now(tz=timezone.utc)
+        return jwt.encode(
+            CLAIMS | {"exp": now + timedelta(minutes=15), "iat": now},
+            signing_key,
+            algorithm,
+        )
+
+    token = sign()
+    return {
+        "sign_per_second": per_second(sign, seconds),
+        "verify_per_second": per_second(
+            lambda: jwt.decode(token, verifying_key, algorithm), seconds
+        ),
+    }
+
+
+def engine(algorithm: str, private_pem, seconds: float) -> dict:
+    cold = TokenEngine(algorithm, SECRET, private_pem)
+    warm = TokenEngine(algorithm, SECRET, private_pem, cache_size=10000)
+    token = cold.encode(CLAIMS, timedelta(minutes=15))
+    return {
+        "sign_per_second": per_second(
+            lambda: cold.encode(CLAIMS, timedelta(minutes=15)), seconds
+        ),
+        "verify_per_second": per_second(lambda: cold.decode(token), seconds),
+        "verify_cached_per_second": per_second(lambda: warm.decode(token), seconds),
+    }
+
+
+def main(args):
+    results = {}
+    for algorithm in args.algorithms:
+        private_pem = keys(algorithm)
+        results[algorithm] = {
+            "pyjwt": pyjwt(algorithm, private_pem, args.seconds),
+            "engine": engine(algorithm, private_pem, args.seconds),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument(
+        "--algorithms", nargs="+", default=["HS256", "ES256", "EdDSA"]
+    )
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+"""p99 latency of /users/me while concurrent logins hash passwords.
+
+Run from backend/ against a running server started with
+RATE_LIMIT_ENABLED=false, since the per-IP login limit would otherwise answer
+most of the logins with 429:
+
+    python -m benchmarks.users_me_latency --base-url http://localhost:8000 --seed
+
+Compare the numbers against a build that hashes on the event loop to see the
+effect of the password hasher pool.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import exit_if_rate_limited, seed_verified_user, summarize
+from config.config import settings
+
+
+USERNAME = "benchuser"
+EMAIL = "benchuser@example.com"
+PASSWORD = "Bench#Password1"
+
+
+async def login(client: httpx.AsyncClient) -> httpx.Response:
+    response = await client.post(
+        "/login", json={"username": USERNAME, "password": PASSWORD}
+    )
+    exit_if_rate_limited([response.status_code])
+    return response
+
+
+async def login_loop(client: httpx.AsyncClient, deadline: float, done: list):
+    while time.perf_counter() < deadline:
+        response = await login(client)
+        response.raise_for_status()
+        done.append(1)
+
+
+async def probe_loop(
+    client: httpx.AsyncClient, access_token: str, deadline: float, samples: list
+):
+    cookies = {"access_token": access_token}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/users/me", cookies=cookies)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+        await asyncio.sleep(0.005)
+
+
+async def main(args):
+    if args.seed:
+        await seed_verified_user(settings.DATABASE_URL, USERNAME, EMAIL, PASSWORD)
+    limits = httpx.Limits(max_connections=args.logins + args.probes + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits) as client:
+        response = await login(client)
+        response.raise_for_status()
+        access_token = response.json()["access_token"]
+
+        deadline = time.perf_counter() + args.duration
+        samples: list[float] = []
+        logins: list[int] = []
+        await asyncio.gather(
+            *(login_loop(client, deadline, logins) for _ in range(args.logins)),
+            *(
+                probe_loop(client, access_token, deadline, samples)
+                for _ in range(args.probes)
+            ),
+        )
+    report = {
+        "concurrent_logins": args.logins,
+        "logins_per_sec": round(len(logins) / args.duration, 1),
+        "users_me": summarize(samples),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=4)
+    parser.add_argument("--seed", action="store_true")
+    asyncio.run(main(parser.parse_args()))
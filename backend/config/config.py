@@ -1,14 +1,37 @@
+from functools import lru_cache
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
-class Settings(BaseSettings):
+class DatabaseSettings(BaseSettings):
+    """What the migration runner and database tools need, and nothing else."""
+
     model_config = SettingsConfigDict(
         env_file=".env", extra="ignore", env_ignore_empty=True
     )
 
     DATABASE_URL: str
-    TOKEN_SECRET_KEY: str
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_MAX_QUERIES: int = 50000
+    DB_POOL_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300.0
+    DB_POOL_WARMUP: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_COMMAND_TIMEOUT: Optional[float] = None
+    DB_ACQUIRE_TIMEOUT: Optional[float] = None
+    DB_POOL_CLOSE_TIMEOUT: float = 10.0
+    DATABASE_REPLICA_URLS: str = ""
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+
+
+class Settings(DatabaseSettings):
+    TOKEN_SECRET_KEY: str = ""
     TOKEN_ALGORITHM: str
+    TOKEN_PRIVATE_KEY_FILE: str = ""
+    TOKEN_PUBLIC_KEY_FILES: str = ""
+    TOKEN_VERIFY_CACHE_SIZE: int = 10000
+    JWKS_MAX_AGE_SECONDS: int = 300
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
     VERIFICATION_TOKEN_EXPIRE_HOURS: int
@@ -21,6 +44,78 @@ class Settings(BaseSettings):
     MAIL_TLS: bool
     MAIL_SSL: bool
     USE_CREDENTIALS: bool
+    MAIL_DISPATCHER_ENABLED: bool = True
+    MAIL_SMTP_POOL_SIZE: int = 2
+    MAIL_SMTP_TIMEOUT: float = 30.0
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_POLL_SECONDS: float = 1.0
+    MAIL_CLAIM_LEASE_SECONDS: float = 120.0
+    MAIL_MAX_ATTEMPTS: int = 8
+    MAIL_RETRY_BASE_SECONDS: float = 5.0
+    MAIL_RETRY_MAX_SECONDS: float = 900.0
+    MAIL_TEMPLATE_PRERENDER: bool = True
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 0
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    ACCESS_TOKEN_EMBED_CLAIMS: bool = False
+    USER_FILTER_ENABLED: bool = False
+    USER_FILTER_CAPACITY: int = 100000
+    USER_FILTER_FP_RATE: float = 0.01
+    USER_FILTER_SYNC_SECONDS: float = 5.0
+    USER_FILTER_REBUILD_SECONDS: float = 3600.0
+    INVALIDATION_LISTENER_ENABLED: bool = True
+    INVALIDATION_HEALTHCHECK_SECONDS: float = 15.0
+    INVALIDATION_RECONNECT_MAX_SECONDS: float = 30.0
+    # off by default: behind a reverse proxy every client shares the proxy's
+    # address, and so one bucket, unless RATE_LIMIT_TRUST_FORWARDED is on
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_WINDOW_SECONDS: float = 60.0
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_LOGIN_PER_IP: int = 30
+    RATE_LIMIT_LOGIN_PER_ACCOUNT: int = 10
+    RATE_LIMIT_REGISTER_PER_IP: int = 10
+    MONITORING_TOKEN: str = ""
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_DB_CONNECTION_SHARE: float = 0.8
+    SERVER_GRACEFUL_TIMEOUT: float = 30.0
+    SERVER_ACCESS_LOG: bool = False
+    SERVER_WARMUP: bool = True
+    JANITOR_ENABLED: bool = True
+    JANITOR_INTERVAL_SECONDS: float = 300.0
+    JANITOR_BATCH_SIZE: int = 1000
+    JANITOR_MAX_BATCHES_PER_SECOND: float = 5.0
+    JANITOR_RETENTION_HOURS: int = 24
+    JANITOR_PARTITIONS_AHEAD: int = 2
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+@lru_cache
+def get_database_settings() -> DatabaseSettings:
+    return DatabaseSettings()
+
+
+class LazySettings:
+    """Stands in for the settings, so `from config.config import settings`
+    does not build and validate them when the importing module loads.
+
+    The first attribute read builds them and copies the field values onto
+    this object; later reads are plain attribute lookups.
+    """
+
+    def __getattr__(self, name: str):
+        values = get_settings()
+        self.__dict__.update(values.__dict__)
+        return getattr(values, name)
 
 
-settings = Settings()
+settings = LazySettings()
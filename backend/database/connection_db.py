@@ -1,22 +1,110 @@
+import asyncio
+import time
 import asyncpg
 from loguru import logger
 from typing import Optional
 from config.config import settings
+from database.queries import RegistryConnection
+from utils.metrics import Histogram
+
+
+class InstrumentedPool(asyncpg.Pool):
+    """asyncpg pool that applies a default acquire timeout and records how
+    long callers wait for a connection."""
+
+    def __init__(self, *args, acquire_timeout: Optional[float] = None, init=None, **kwargs):
+        self.acquire_timeout = acquire_timeout
+        self.connection_init = init
+        self.acquire_wait = Histogram()
+        self.waiting = 0
+        self.connections_opened = 0
+        super().__init__(*args, init=self._init_connection, **kwargs)
+
+    async def _init_connection(self, conn: asyncpg.Connection):
+        self.connections_opened += 1
+        if self.connection_init is not None:
+            await self.connection_init(conn)
+
+    async def _acquire(self, timeout):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            return await super()._acquire(
+                self.acquire_timeout if timeout is None else timeout
+            )
+        finally:
+            self.waiting -= 1
+            self.acquire_wait.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        size = self.get_size()
+        idle = self.get_idle_size()
+        return {
+            "min_size": self.get_min_size(),
+            "max_size": self.get_max_size(),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "waiting": self.waiting,
+            "connections_opened": self.connections_opened,
+            "acquire_wait_seconds": self.acquire_wait.snapshot(),
+        }
 
 
 class DatabaseConnection:
     def __init__(self):
-        self.connection_pool: Optional[asyncpg.Pool] = None
+        self.connection_pool: Optional[InstrumentedPool] = None
+        self.replica_pools: list[InstrumentedPool] = []
+        self._next_replica = 0
+        # user_id -> monotonic deadline until which that user's reads stay on
+        # the primary, so a replica lagging behind a write is never consulted
+        self._recent_writes: dict[str, float] = {}
 
     async def init_connection(self):
         logger.info("initiation of DB")
         try:
-            self.connection_pool = await asyncpg.create_pool(
-                dsn=settings.DATABASE_URL, min_size=1, max_size=10
-            )
+            self.connection_pool = await self._create_pool(settings.DATABASE_URL)
         except Exception as e:
             logger.error("Error while creating connection pool", e)
             raise
+        for dsn in filter(None, map(str.strip, settings.DATABASE_REPLICA_URLS.split(","))):
+            try:
+                self.replica_pools.append(await self._create_pool(dsn))
+            except Exception as e:
+                logger.error(f"Skipping unreachable read replica: {e}")
+
+    async def _create_pool(self, dsn: str) -> InstrumentedPool:
+        pool = await InstrumentedPool(
+            dsn,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            max_queries=settings.DB_POOL_MAX_QUERIES,
+            max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+            loop=None,
+            connection_class=RegistryConnection,
+            record_class=asyncpg.Record,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+            command_timeout=settings.DB_COMMAND_TIMEOUT,
+            acquire_timeout=settings.DB_ACQUIRE_TIMEOUT,
+            init=RegistryConnection.prepare_registry,
+        )
+        if settings.DB_POOL_WARMUP:
+            await self._warm_up(pool)
+        return pool
+
+    async def _warm_up(self, pool: InstrumentedPool):
+        async def ping():
+            async with pool.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+
+        await asyncio.gather(*(ping() for _ in range(settings.DB_POOL_MIN_SIZE)))
+
+    async def connect_listener(self) -> asyncpg.Connection:
+        """A connection of its own on the primary for LISTEN: pooled ones are
+        reset on release, which drops listeners, and replicas get no NOTIFY."""
+        return await asyncpg.connect(
+            settings.DATABASE_URL, command_timeout=settings.DB_COMMAND_TIMEOUT
+        )
 
     async def get_connection(self) -> asyncpg.Pool:
         if self.connection_pool is None:
@@ -24,10 +112,62 @@ class DatabaseConnection:
             raise
         return self.connection_pool
 
+    def read_pool(
+        self, user_id: Optional[str] = None, written_at: Optional[float] = None
+    ) -> asyncpg.Pool:
+        """Pick a replica for a read, unless the user was written recently.
+
+        ``written_at`` is a unix timestamp of a write the caller knows about,
+        such as the issue time of a fresh token, which keeps read-your-writes
+        across workers that did not see the write themselves.
+        """
+        if self.connection_pool is None:
+            logger.error("The connection pool is NULL")
+            raise
+        if not self.replica_pools:
+            return self.connection_pool
+        window = settings.DB_READ_YOUR_WRITES_SECONDS
+        if written_at is not None and time.time() - written_at < window:
+            return self.connection_pool
+        if user_id is not None:
+            deadline = self._recent_writes.get(str(user_id))
+            if deadline is not None:
+                if deadline > time.monotonic():
+                    return self.connection_pool
+                del self._recent_writes[str(user_id)]
+        self._next_replica = (self._next_replica + 1) % len(self.replica_pools)
+        return self.replica_pools[self._next_replica]
+
+    def mark_written(self, user_id: str):
+        if not self.replica_pools:
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) > 10000:
+            self._recent_writes = {
+                key: deadline
+                for key, deadline in self._recent_writes.items()
+                if deadline > now
+            }
+        self._recent_writes[str(user_id)] = now + settings.DB_READ_YOUR_WRITES_SECONDS
+
+    def stats(self) -> dict:
+        return self.connection_pool.stats() | {
+            "replicas": [pool.stats() for pool in self.replica_pools]
+        }
+
     async def close_connection(self):
         logger.info("Closing Database connection")
+        pools = [self.connection_pool, *self.replica_pools]
         try:
-            await self.connection_pool.close()
+            # close() waits for checked-out connections to be released
+            await asyncio.wait_for(
+                asyncio.gather(*(pool.close() for pool in pools)),
+                settings.DB_POOL_CLOSE_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Connections still busy at shutdown, terminating them")
+            for pool in pools:
+                pool.terminate()
         except Exception as e:
             logger.error("Error occurred during close", e)
 
@@ -0,0 +1,370 @@
+import time
+from collections import defaultdict
+from typing import Optional
+
+import asyncpg
+from asyncpg.prepared_stmt import PreparedStatement
+
+from utils.metrics import Histogram
+
+
+USER_PROJECTION = (
+    "user_id, email, username, first_name, last_name, is_active, is_verified"
+)
+
+# Workers LISTEN here for changes that stale their in-process user state.
+# Statements notify from RETURNING, so the event is delivered only if, and
+# as soon as, the change commits.
+AUTH_EVENTS_CHANNEL = "auth_events"
+
+
+def notify_event(event: str, at_param: str, *columns: str) -> str:
+    fields = "".join(f", '{column}', {column}" for column in columns)
+    return (
+        f"pg_notify('{AUTH_EVENTS_CHANNEL}', json_build_object("
+        f"'event', {event}, 'user_id', user_id, 'at', {at_param}::float8{fields})::text)"
+    )
+
+
+# Every statement the application sends, by name. Each pooled connection
+# prepares the whole set once when it is opened.
+STATEMENTS: dict[str, str] = {
+    "user_by_id": f"SELECT {USER_PROJECTION} FROM users WHERE user_id = $1",
+    # one column per statement so each lookup hits its own unique index
+    "login_by_email": f"""
+    SELECT {USER_PROJECTION}, hashed_password FROM users WHERE email = $1
+    """,
+    "login_by_username": f"""
+    SELECT {USER_PROJECTION}, hashed_password FROM users WHERE username = $1
+    """,
+    # ON CONFLICT covers both unique indexes, so a duplicate email or username
+    # inserts nothing and returns no row, even when registrations race. The
+    # verification token and the email carrying it commit with the user, so a
+    # restart can neither lose the email nor send a link to an unstored token.
+    # Every worker adds the new logins to its login filter on the notification.
+    "register_user": f"""
+    WITH new_user AS (
+        INSERT INTO users (username, email, hashed_password, first_name, last_name, is_verified, is_active, created_at, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        ON CONFLICT DO NOTHING
+        RETURNING user_id, email, username, first_name, last_name,
+            {notify_event("'created'", "$15", "email", "username")}
+    ),
+    token AS (
+        INSERT INTO email_verification (user_id, token_hash, expires_at, created_at)
+        SELECT user_id, $10, $11, $8 FROM new_user
+    ),
+    queued AS (
+        INSERT INTO email_outbox (recipient, subject, template, context, next_attempt_at, created_at)
+        SELECT email, $12, $13, $14::jsonb, $8, $8 FROM new_user
+    )
+    SELECT user_id, email, username, first_name, last_name FROM new_user
+    """,
+    "estimate_users": """
+    SELECT greatest(reltuples, 0)::bigint FROM pg_class WHERE oid = 'users'::regclass
+    """,
+    "all_logins": "SELECT email, username, created_at FROM users",
+    "users_created_since": """
+    SELECT email, username, created_at FROM users WHERE created_at > $1
+    """,
+    "rehash_password": """
+    UPDATE users SET hashed_password = $3 WHERE user_id = $1 AND hashed_password = $2
+    """,
+    # suspending also revokes the access tokens issued so far
+    "set_user_active": f"""
+    UPDATE users SET
+        is_active = $2,
+        updated_at = $3,
+        sessions_revoked_at = CASE WHEN $2 THEN sessions_revoked_at ELSE $3 END
+    WHERE user_id = $1
+    RETURNING {notify_event("CASE WHEN $2 THEN 'activated' ELSE 'suspended' END", "$4")}
+    """,
+    "recent_revocations": """
+    SELECT user_id, sessions_revoked_at FROM users WHERE sessions_revoked_at > $1
+    """,
+    "insert_refresh_token": """
+    INSERT INTO refresh_tokens (user_id, token, expires_at, created_at, signed_in_at, user_agent, ip)
+    VALUES ($1, $2, $3, $4, $4, $5, $6::inet)
+    """,
+    # the unreferenced CTE still runs, so last_login rides along with the
+    # token insert in the same statement
+    "insert_refresh_token_on_login": """
+    WITH touched AS (
+        UPDATE users SET last_login = $4 WHERE user_id = $1
+    )
+    INSERT INTO refresh_tokens (user_id, token, expires_at, created_at, signed_in_at, user_agent, ip)
+    VALUES ($1, $2, $3, $4, $4, $5, $6::inet)
+    """,
+    # The presented row is locked, so of several concurrent refreshes only
+    # the first rotates; the others see it revoked and trip reuse detection.
+    "rotate_refresh_token": f"""
+    WITH presented AS (
+        SELECT refresh_id, user_id, revoked, expires_at,
+               coalesce(signed_in_at, created_at) AS signed_in_at
+        FROM refresh_tokens
+        WHERE token = $1
+        FOR UPDATE
+    ),
+    owner AS (
+        SELECT {USER_PROJECTION}
+        FROM users
+        WHERE user_id = (SELECT user_id FROM presented)
+    ),
+    rotated AS (
+        UPDATE refresh_tokens r SET revoked = TRUE
+        FROM presented p, owner o
+        WHERE r.refresh_id = p.refresh_id
+          AND p.revoked IS NOT TRUE AND p.expires_at > $4 AND o.is_active
+        RETURNING r.user_id, p.signed_in_at
+    ),
+    -- the session keeps its sign-in time; the client is whoever refreshed
+    issued AS (
+        INSERT INTO refresh_tokens (user_id, token, expires_at, created_at, signed_in_at, user_agent, ip)
+        SELECT user_id, $2, $3, $4, signed_in_at, $5, $6::inet FROM rotated
+    ),
+    reused AS (
+        UPDATE refresh_tokens r SET revoked = TRUE
+        FROM presented p, owner o
+        WHERE p.revoked AND p.expires_at > $4 AND o.is_active
+          AND r.user_id = p.user_id AND NOT r.revoked
+    )
+    SELECT p.revoked, p.expires_at, o.*, EXISTS (SELECT 1 FROM rotated) AS rotated
+    FROM presented p LEFT JOIN owner o ON TRUE
+    """,
+    # Keyset page of live sessions, newest first: ($3, $4) is the last row of
+    # the previous page, so a page costs the same however many tokens exist.
+    # rows from before session metadata have no signed_in_at
+    "list_sessions": """
+    SELECT refresh_id, coalesce(signed_in_at, created_at) AS signed_in_at,
+           created_at, expires_at, user_agent,
+           host(ip) AS ip, coalesce(token = $5, FALSE) AS current
+    FROM refresh_tokens
+    WHERE user_id = $1 AND NOT revoked AND expires_at > $2
+      AND (created_at, refresh_id) < ($3, $4)
+    ORDER BY created_at DESC, refresh_id DESC
+    LIMIT $6
+    """,
+    # Signing out also ends the token, so presenting it again reads as
+    # expired instead of tripping reuse detection on the user's other sessions.
+    "revoke_session": """
+    UPDATE refresh_tokens SET revoked = TRUE, expires_at = least(expires_at, $3)
+    WHERE refresh_id = $1 AND user_id = $2 AND NOT revoked
+    """,
+    "revoke_presented_token": """
+    UPDATE refresh_tokens SET revoked = TRUE, expires_at = least(expires_at, $2)
+    WHERE token = $1 AND NOT revoked
+    RETURNING user_id
+    """,
+    "revoke_user_sessions": f"""
+    WITH revoked AS (
+        UPDATE refresh_tokens SET revoked = TRUE, expires_at = least(expires_at, $2)
+        WHERE user_id = $1 AND NOT revoked
+        RETURNING 1
+    ),
+    marked AS (
+        UPDATE users SET sessions_revoked_at = $2 WHERE user_id = $1
+        RETURNING {notify_event("'revoked'", "$3")}
+    )
+    SELECT count(*) FROM revoked
+    """,
+    # The token row is locked, so a double-click waits for the first request
+    # and then sees the token already used; the user flips in the same statement.
+    "verify_email_token": f"""
+    WITH presented AS (
+        SELECT email_v_id, user_id, token_hash, is_used, expires_at, created_at
+        FROM email_verification
+        WHERE token_hash = $1
+        FOR UPDATE
+    ),
+    consumed AS (
+        UPDATE email_verification e SET is_used = TRUE
+        FROM presented p
+        WHERE e.email_v_id = p.email_v_id
+          AND p.is_used IS NOT TRUE AND p.expires_at > $2
+        RETURNING e.user_id
+    ),
+    verified AS (
+        UPDATE users SET is_verified = TRUE
+        WHERE user_id = (SELECT user_id FROM consumed)
+        RETURNING {notify_event("'verified'", "$3")}
+    )
+    SELECT p.*, EXISTS (SELECT 1 FROM consumed) AS consumed
+    FROM presented p
+    """,
+    "rate_limit_hit": """
+    INSERT INTO rate_limits AS r (key, window_index, prev_count, count, updated_at)
+    VALUES ($1, $2, 0, 1, $3)
+    ON CONFLICT (key) DO UPDATE SET
+        prev_count = CASE
+            WHEN r.window_index = $2 THEN r.prev_count
+            WHEN r.window_index = $2 - 1 THEN r.count
+            ELSE 0
+        END,
+        count = CASE WHEN r.window_index = $2 THEN r.count + 1 ELSE 1 END,
+        window_index = $2,
+        updated_at = $3
+    RETURNING prev_count, count
+    """,
+    "refresh_tokens_partitioned": """
+    SELECT relkind = 'p' FROM pg_class WHERE oid = 'refresh_tokens'::regclass
+    """,
+    "lock_partition_maintenance": """
+    SELECT pg_try_advisory_xact_lock(hashtext('refresh_tokens_partitions'))
+    """,
+    "refresh_token_partitions": """
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'refresh_tokens'::regclass
+    """,
+    # Revoked rows stay until they expire: their JWT is valid that long, and
+    # a replayed one must still find its row for reuse detection to fire.
+    "purge_refresh_tokens": """
+    DELETE FROM refresh_tokens WHERE refresh_id IN (
+        SELECT refresh_id FROM refresh_tokens
+        WHERE expires_at < $1
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+    # claimed rows are leased rather than locked for the whole send, so a
+    # dispatcher that dies mid-batch only delays them until the lease ends
+    "claim_outbox_batch": """
+    UPDATE email_outbox o SET attempts = o.attempts + 1, next_attempt_at = $2
+    FROM (
+        SELECT outbox_id FROM email_outbox
+        WHERE failed_at IS NULL AND next_attempt_at <= $1
+        ORDER BY next_attempt_at
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE o.outbox_id = due.outbox_id
+    RETURNING o.outbox_id, o.recipient, o.subject, o.template, o.context, o.attempts
+    """,
+    "delete_sent_outbox": """
+    DELETE FROM email_outbox WHERE outbox_id = ANY($1::uuid[])
+    """,
+    "reschedule_outbox": """
+    UPDATE email_outbox o
+    SET next_attempt_at = f.next_attempt_at,
+        last_error = f.error,
+        failed_at = CASE WHEN f.give_up THEN $5::timestamp END
+    FROM unnest($1::uuid[], $2::timestamp[], $3::text[], $4::bool[])
+        AS f(outbox_id, next_attempt_at, error, give_up)
+    WHERE o.outbox_id = f.outbox_id
+    """,
+    "purge_failed_outbox": """
+    DELETE FROM email_outbox WHERE outbox_id IN (
+        SELECT outbox_id FROM email_outbox
+        WHERE failed_at < least($1::timestamp, $2::timestamp)
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+    "purge_rate_limits": """
+    DELETE FROM rate_limits WHERE key IN (
+        SELECT key FROM rate_limits
+        WHERE updated_at < least($1::timestamp, $2::timestamp)
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+    "purge_verification_tokens": """
+    DELETE FROM email_verification WHERE email_v_id IN (
+        SELECT email_v_id FROM email_verification
+        WHERE expires_at < $1 OR (is_used AND created_at < $2)
+        LIMIT $3
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+}
+
+
+class StatementStats:
+    """Per-statement call, error and latency counters across all connections."""
+
+    def __init__(self):
+        self.latency = {name: Histogram() for name in STATEMENTS}
+        self.errors: dict[str, int] = defaultdict(int)
+        self.prepared = 0
+
+    def observe(self, name: str, seconds: float, failed: bool = False):
+        self.latency[name].observe(seconds)
+        if failed:
+            self.errors[name] += 1
+
+    def stats(self) -> dict:
+        return {
+            "connections_prepared": self.prepared,
+            "statements": {
+                name: {
+                    "calls": histogram.count,
+                    "errors": self.errors[name],
+                    "latency_seconds": histogram.snapshot(),
+                }
+                for name, histogram in self.latency.items()
+            },
+        }
+
+
+statement_stats = StatementStats()
+
+
+class RegistryConnection(asyncpg.Connection):
+    """asyncpg connection that runs the statements in STATEMENTS by name."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statements: dict[str, PreparedStatement] = {}
+
+    async def prepare_registry(self):
+        for name in STATEMENTS:
+            self._statements[name] = await self.prepare(STATEMENTS[name])
+        statement_stats.prepared += 1
+
+    async def _statement(self, name: str) -> PreparedStatement:
+        statement = self._statements.get(name)
+        if statement is None:
+            statement = self._statements[name] = await self.prepare(STATEMENTS[name])
+        # asyncpg refuses statement handles from an earlier pool checkout, so
+        # hand out a fresh one bound to the same server-side statement. This
+        # uses asyncpg internals: requirement.txt pins asyncpg exactly, and
+        # benchmarks/statement_checks.py fails if a new version breaks it.
+        return PreparedStatement(self, statement._query, statement._state)
+
+    async def _run(self, name: str, method: str, args: tuple):
+        started = time.perf_counter()
+        failed = True
+        try:
+            statement = await self._statement(name)
+            try:
+                result = await getattr(statement, method)(*args)
+            except asyncpg.InvalidCachedStatementError:
+                # a migration changed a table under the plan; re-prepare, and
+                # retry unless the surrounding transaction is already aborted
+                del self._statements[name]
+                if self.is_in_transaction():
+                    raise
+                statement = await self._statement(name)
+                result = await getattr(statement, method)(*args)
+            failed = False
+            return result, statement
+        finally:
+            statement_stats.observe(name, time.perf_counter() - started, failed)
+
+    async def fetch_named(self, name: str, *args) -> list[asyncpg.Record]:
+        return (await self._run(name, "fetch", args))[0]
+
+    async def fetchrow_named(self, name: str, *args) -> Optional[asyncpg.Record]:
+        return (await self._run(name, "fetchrow", args))[0]
+
+    async def fetchval_named(self, name: str, *args):
+        return (await self._run(name, "fetchval", args))[0]
+
+    async def cursor_named(self, name: str, *args, prefetch: Optional[int] = None):
+        """Server-side cursor over a statement; iterate it inside a transaction."""
+        return (await self._statement(name)).cursor(*args, prefetch=prefetch)
+
+    async def execute_named(self, name: str, *args) -> str:
+        """Run a statement for its effect and return the command status, e.g. ``DELETE 3``."""
+        _, statement = await self._run(name, "fetchrow", args)
+        return statement.get_statusmsg()
@@ -1,19 +1,56 @@
+import os
+import time
 from fastapi import FastAPI
 from database.connection_db import connection
 from contextlib import asynccontextmanager
+from loguru import logger
 
 from routes.auth import auth_route
+from routes.metrics import metrics_route
+from routes.monitoring import monitoring_route
+from routes.sessions import sessions_route
+from routes.well_known import well_known_route
+from services.invalidation import invalidation_listener
+from services.janitor import janitor
+from services.mail_dispatcher import mail_dispatcher
+from utils.bloom import login_filter
+from utils.metrics import MetricsMiddleware
+from config.config import settings
+from utils.password import hasher_pool, verify_dummy_password
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connection.init_connection()
+    hasher_pool.start()
+    if settings.SERVER_WARMUP:
+        # first Argon2 call pays for thread start-up and the dummy hash
+        await verify_dummy_password("warm-up")
+    janitor.start(await connection.get_connection())
+    mail_dispatcher.start(await connection.get_connection())
+    login_filter.start(await connection.get_connection())
+    invalidation_listener.start(await connection.get_connection())
+    launched_at = os.environ.get("SERVER_LAUNCHED_AT")
+    if launched_at:
+        logger.info(
+            f"Worker {os.getpid()} ready {time.time() - float(launched_at):.2f}s after launch"
+        )
     yield
+    await invalidation_listener.stop()
+    await login_filter.stop()
+    await mail_dispatcher.stop()
+    await janitor.stop()
+    await hasher_pool.shutdown()
     await connection.close_connection()
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_route)
+app.include_router(sessions_route)
+app.include_router(monitoring_route)
+app.include_router(well_known_route)
+app.include_router(metrics_route)
 
 
 @app.get("/")
@@ -1,25 +1,24 @@
-from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Cookie,
     Depends,
     HTTPException,
     Query,
+    Request,
     status,
 )
 from fastapi.responses import JSONResponse
 
 
-from schemas.email import VerificationEmail
 from schemas.user import User, UserCreate, UserLogin
 from database.connection_db import connection
 import asyncpg
 from services.auth import auth
 from services.email_verification import email_verification
-from test import get_hash_token
+from services.sessions import client_info, sessions
 from utils.dependencies import get_current_active_user
+from utils.rate_limit import rate_limiter
 from utils.tokens import generate_token
 from config.config import settings
 
@@ -30,43 +29,17 @@ auth_route = APIRouter(tags=["Authentication"])
 @auth_route.post("/register", response_model=User)
 async def register(
     user: UserCreate,
-    background_task: BackgroundTasks,
+    request: Request,
     db_pool: asyncpg.Pool = Depends(connection.get_connection),
 ):
+    await rate_limiter.check(request, "register", settings.RATE_LIMIT_REGISTER_PER_IP)
     if user.confirm_password != user.password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password and Confirm Password don't macth ",
         )
-    query = "SELECT email, username FROM users WHERE email = $1 OR username = $2"
-    async with db_pool.acquire() as conn:
-        result = await conn.fetch(query, user.email.lower(), user.username.lower())
-    if result:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="The provided email or username already exists",
-        )
-    result = await auth.create_user(user, db_pool)
-    if result:
-        user_out = dict(result)
-        email_verif_token = await email_verification.generate_and_save_token(
-            str(user_out.get("user_id", 0)), db_pool
-        )
-        email_data = VerificationEmail(
-            email=[user_out.get("email")],
-            body={
-                "receiver": user_out.get("username"),
-                "app_name": "Touch Somebody",
-                "verification_link": f"http://localhost:8000/verify_email?token={email_verif_token}",
-            },
-        )
-        await email_verification.send_email(email_data, background_task)
-        return User(**user_out)
-    else:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to Register user",
-        )
+    user_out = dict(await auth.create_user(user, db_pool))
+    return User(**user_out)
 
 
 @auth_route.get("/verify_email")
@@ -81,6 +54,7 @@ async def verify_email(
 @auth_route.post("/login", response_model=User)
 async def authenticate_user(
     user: UserLogin,
+    request: Request,
     db_pool: asyncpg.Pool = Depends(connection.get_connection),
 ):
     if user.email and user.username:
@@ -88,10 +62,26 @@ async def authenticate_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Please provide either username or email not both",
         )
+    # throttled before any lookup or Argon2 work is spent on the attempt
+    await rate_limiter.check(
+        request,
+        "login",
+        settings.RATE_LIMIT_LOGIN_PER_IP,
+        account=user.email or user.username,
+        account_limit=settings.RATE_LIMIT_LOGIN_PER_ACCOUNT,
+    )
     try:
         logged_user = await auth.login_user(user, db_pool)
         user_id = str(logged_user.get("user_id"))
-        tokens = await auth.generate_and_store_tokens(user_id, db_pool)
+        user_agent, ip = client_info(request)
+        tokens = await auth.generate_and_store_tokens(
+            user_id,
+            db_pool,
+            claims=logged_user,
+            record_login=True,
+            user_agent=user_agent,
+            ip=ip,
+        )
         res = JSONResponse(
             content={
                 "user_id": user_id,
@@ -131,55 +121,17 @@ async def authenticate_user(
 @auth_route.post("/refresh")
 async def regenrate_access_token(
     refresh_token: Annotated[str, Cookie()],
+    request: Request,
     db_pool: asyncpg.Pool = Depends(connection.get_connection),
 ):
-    hashed_token = get_hash_token(refresh_token)
-    refresh_query = "SELECT * FROM refresh_tokens WHERE token = $1"
-    async with db_pool.acquire() as conn:
-        result = await conn.fetchrow(refresh_query, hashed_token)
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
-        )
-    result = dict(result)
-    expire_date = result.get("expires_at")
-    if expire_date < datetime.now():
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
-        )
-    query_user = "SELECT * FROM users WHERE user_id = $1"
-    async with db_pool.acquire() as conn:
-        user = await conn.fetchrow(query_user, result.get("user_id"))
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User Not Found"
-        )
-    user_data = dict(user)
-    if not user_data.get("is_active"):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="This user is not active"
-        )
-    if result.get("revoked"):
-        user_associated_tokens = (
-            "UPDATE refresh_tokens SET revoked = TRUE WHERE user_id = $1"
-        )
-        async with db_pool.acquire() as conn:
-            await conn.fetch(user_associated_tokens, user_data.get("user_id"))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access"
-        )
-    # implements rotation
-    user_associated_token = (
-        "UPDATE refresh_tokens SET revoked = TRUE WHERE refresh_id = $1"
-    )
-    async with db_pool.acquire() as conn:
-        await conn.fetch(user_associated_token, result.get("refresh_id"))
-    tokens = await auth.generate_and_store_tokens(
-        User(**user_data), user_data.get("user_id"), db_pool
+    user_agent, ip = client_info(request)
+    tokens = await auth.rotate_refresh_token(
+        refresh_token, db_pool, user_agent=user_agent, ip=ip
     )
+    user_data = tokens.get("user")
     res = JSONResponse(
         content={
-            "user_id": user_data.get("user_id"),
+            "user_id": str(user_data.get("user_id")),
             "email": user_data.get("email"),
             "username": user_data.get("username"),
             "first_name": user_data.get("first_name"),
@@ -208,6 +160,32 @@ async def regenrate_access_token(
     return res
 
 
+def clear_auth_cookies(res: JSONResponse) -> JSONResponse:
+    for key in ("access_token", "refresh_token"):
+        res.delete_cookie(key=key, path="/", secure=True, httponly=True, samesite="Lax")
+    return res
+
+
+@auth_route.post("/logout")
+async def logout(
+    refresh_token: Annotated[Optional[str], Cookie()] = None,
+    db_pool: asyncpg.Pool = Depends(connection.get_connection),
+):
+    await sessions.logout(refresh_token, db_pool)
+    return clear_auth_cookies(JSONResponse(content={"Result": "Logged out"}))
+
+
+@auth_route.post("/logout-all")
+async def logout_all(
+    current_user=Depends(get_current_active_user),
+    db_pool: asyncpg.Pool = Depends(connection.get_connection),
+):
+    revoked = await sessions.logout_all(str(current_user["user_id"]), db_pool)
+    return clear_auth_cookies(
+        JSONResponse(content={"Result": "Logged out", "revoked_sessions": revoked})
+    )
+
+
 @auth_route.get("/users/me")
 async def get_user(current_user=Depends(get_current_active_user)):
     return {
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Depends, Response
+
+from database.connection_db import connection
+from database.queries import statement_stats
+from services.invalidation import invalidation_listener
+from services.mail_dispatcher import mail_dispatcher
+from utils.bloom import login_filter
+from utils.dependencies import require_monitoring_token
+from utils.metrics import metrics
+from utils.password import hasher_pool
+from utils.tokens import get_token_engine
+from utils.user_cache import user_cache
+
+
+metrics_route = APIRouter(
+    tags=["Monitoring"], dependencies=[Depends(require_monitoring_token)]
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def pools() -> dict:
+    named = {}
+    if connection.connection_pool is not None:
+        named["primary"] = connection.connection_pool
+    for index, pool in enumerate(connection.replica_pools):
+        named[f"replica{index}"] = pool
+    return named
+
+
+metrics.collect(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a pooled connection.",
+    "histogram",
+    ("pool",),
+    lambda: {(name,): pool.acquire_wait for name, pool in pools().items()},
+)
+metrics.collect(
+    "db_pool_connections",
+    "Pooled connections by state.",
+    "gauge",
+    ("pool", "state"),
+    lambda: {
+        (name, state): value
+        for name, pool in pools().items()
+        for state, value in (
+            ("idle", pool.get_idle_size()),
+            ("in_use", pool.get_size() - pool.get_idle_size()),
+            ("waiting", pool.waiting),
+        )
+    },
+)
+metrics.collect(
+    "db_statement_duration_seconds",
+    "Execution time of named statements, pool acquire excluded.",
+    "histogram",
+    ("statement",),
+    lambda: {
+        (name,): histogram
+        for name, histogram in statement_stats.latency.items()
+        if histogram.count
+    },
+)
+metrics.collect(
+    "db_statement_errors_total",
+    "Named statements that raised.",
+    "counter",
+    ("statement",),
+    lambda: {(name,): count for name, count in statement_stats.errors.items()},
+)
+metrics.collect(
+    "password_hash_jobs",
+    "Argon2 jobs waiting for or running on the hasher pool.",
+    "gauge",
+    ("state",),
+    lambda: {("waiting",): hasher_pool.waiting, ("running",): hasher_pool.running},
+)
+metrics.collect(
+    "token_verify_cache_total",
+    "Access token verifications answered from the claims cache or not.",
+    "counter",
+    ("result",),
+    lambda: {("hit",): get_token_engine().hits, ("miss",): get_token_engine().misses},
+)
+metrics.collect(
+    "user_cache_lookups_total",
+    "User row lookups answered from the in-process cache or not.",
+    "counter",
+    ("result",),
+    lambda: {("hit",): user_cache.hits, ("miss",): user_cache.misses},
+)
+metrics.collect(
+    "login_filter_skipped_queries_total",
+    "Logins answered as unknown without a database query.",
+    "counter",
+    (),
+    lambda: {(): login_filter.skipped_queries},
+)
+metrics.collect(
+    "mail_send_duration_seconds",
+    "Time to hand one email to the SMTP server.",
+    "histogram",
+    (),
+    lambda: {(): mail_dispatcher.send_latency},
+)
+metrics.collect(
+    "mail_outbox_total",
+    "Outbox deliveries by result.",
+    "counter",
+    ("result",),
+    lambda: {
+        ("sent",): mail_dispatcher.sent,
+        ("failed_attempt",): mail_dispatcher.failed_attempts,
+        ("given_up",): mail_dispatcher.given_up,
+    },
+)
+metrics.collect(
+    "invalidation_listener_connected",
+    "1 while this worker is listening for user changes.",
+    "gauge",
+    (),
+    lambda: {(): int(invalidation_listener.connected)},
+)
+metrics.collect(
+    "invalidation_listener_total",
+    "Listener activity: events applied, resyncs and reconnects.",
+    "counter",
+    ("kind",),
+    lambda: {
+        ("event",): invalidation_listener.events,
+        ("resync",): invalidation_listener.resyncs,
+        ("reconnect",): invalidation_listener.reconnects,
+    },
+)
+
+
+@metrics_route.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Every metric of this worker in the Prometheus text format."""
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, Depends
+
+from database.connection_db import connection
+from database.queries import statement_stats
+from services.invalidation import invalidation_listener
+from services.janitor import janitor
+from services.mail_dispatcher import mail_dispatcher
+from utils.bloom import login_filter
+from utils.dependencies import require_monitoring_token
+from utils.password import hasher_pool
+from utils.rate_limit import rate_limiter
+from utils.tokens import get_token_engine
+from utils.user_cache import user_cache
+
+
+monitoring_route = APIRouter(
+    prefix="/stats", tags=["Monitoring"], dependencies=[Depends(require_monitoring_token)]
+)
+
+
+@monitoring_route.get("/hasher")
+async def hasher_stats():
+    return hasher_pool.stats()
+
+
+@monitoring_route.get("/user-cache")
+async def user_cache_stats():
+    return user_cache.stats()
+
+
+@monitoring_route.get("/invalidation")
+async def invalidation_stats():
+    return invalidation_listener.stats()
+
+
+@monitoring_route.get("/janitor")
+async def janitor_stats():
+    return janitor.stats()
+
+
+@monitoring_route.get("/mail")
+async def mail_stats():
+    return mail_dispatcher.stats()
+
+
+@monitoring_route.get("/login-filter")
+async def login_filter_stats():
+    return login_filter.stats()
+
+
+@monitoring_route.get("/rate-limit")
+async def rate_limit_stats():
+    return rate_limiter.stats()
+
+
+@monitoring_route.get("/tokens")
+async def token_stats():
+    return get_token_engine().stats()
+
+
+@monitoring_route.get("/pool")
+async def pool_stats():
+    return connection.stats()
+
+
+@monitoring_route.get("/queries")
+async def query_stats():
+    return statement_stats.stats()
@@ -0,0 +1,34 @@
+import uuid
+from typing import Annotated, Optional
+from fastapi import APIRouter, Cookie, Depends, Query, status
+
+from database.connection_db import connection
+from schemas.session import SessionPage
+from services.sessions import sessions
+from utils.dependencies import get_current_active_user
+import asyncpg
+
+
+sessions_route = APIRouter(prefix="/sessions", tags=["Sessions"])
+
+
+@sessions_route.get("", response_model=SessionPage)
+async def list_sessions(
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: Annotated[Optional[str], Query()] = None,
+    refresh_token: Annotated[Optional[str], Cookie()] = None,
+    current_user=Depends(get_current_active_user),
+    db_pool: asyncpg.Pool = Depends(connection.get_connection),
+):
+    return await sessions.list_sessions(
+        str(current_user["user_id"]), limit, cursor, refresh_token, db_pool
+    )
+
+
+@sessions_route.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_session(
+    session_id: uuid.UUID,
+    current_user=Depends(get_current_active_user),
+    db_pool: asyncpg.Pool = Depends(connection.get_connection),
+):
+    await sessions.revoke_session(str(current_user["user_id"]), session_id, db_pool)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Request, Response, status
+
+from config.config import settings
+from utils.tokens import get_token_engine
+
+
+well_known_route = APIRouter(prefix="/.well-known", tags=["Keys"])
+
+
+@well_known_route.get("/jwks.json")
+async def jwks(request: Request):
+    """Public keys that verify our tokens, for services that validate them locally."""
+    engine = get_token_engine()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": engine.jwks_etag,
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or engine.jwks_etag
+        in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=engine.jwks_document,
+        media_type="application/json",
+        headers=headers,
+    )
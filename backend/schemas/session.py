@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class Session(BaseModel):
+    session_id: str
+    signed_in_at: datetime
+    last_refreshed_at: datetime
+    expires_at: datetime
+    user_agent: Optional[str] = None
+    ip: Optional[str] = None
+    current: bool
+
+
+class SessionPage(BaseModel):
+    sessions: list[Session]
+    next_cursor: Optional[str] = None
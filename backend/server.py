@@ -0,0 +1,116 @@
+"""Production entry point: several uvicorn workers on uvloop and httptools.
+
+Run from backend/:
+
+    python server.py                     # SERVER_WORKERS, or one per CPU
+    python server.py --workers 4 --port 8000
+
+Before the workers are spawned, the database connection budget (a share of
+max_connections on the primary and on each read replica) is split between
+them; every worker opens one pool per server. Argon2 threads are split the
+same way over the CPUs. Sizing reads its own Settings instance and exports
+the results before the app's settings are first built, so the workers, and
+the app itself when it runs in this process, see them. The app is then
+imported once up front, so a broken configuration fails here instead of in
+every worker, and the import time shows up in the log. SIGTERM lets
+in-flight requests finish for up to SERVER_GRACEFUL_TIMEOUT seconds, then
+each worker runs its lifespan shutdown, which drains the database pools.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import asyncpg
+import uvicorn
+from loguru import logger
+
+from config.config import Settings
+
+
+async def connection_budget(dsn: str, share: float) -> int:
+    """Connections this service may hold on one server, across all workers."""
+    conn = await asyncpg.connect(dsn, timeout=10)
+    try:
+        max_connections = int(await conn.fetchval("SHOW max_connections"))
+        reserved = int(await conn.fetchval("SHOW superuser_reserved_connections"))
+    finally:
+        await conn.close()
+    return int((max_connections - reserved) * share)
+
+
+async def connection_budgets(dsns: list[str], share: float) -> list:
+    return await asyncio.gather(
+        *(connection_budget(dsn, share) for dsn in dsns), return_exceptions=True
+    )
+
+
+def size_worker_pools(configured: Settings, workers: int):
+    """Export per-worker sizes; spawned workers read them back through Settings."""
+    replicas = filter(None, map(str.strip, configured.DATABASE_REPLICA_URLS.split(",")))
+    budgets = asyncio.run(
+        connection_budgets(
+            [configured.DATABASE_URL, *replicas], configured.SERVER_DB_CONNECTION_SHARE
+        )
+    )
+    # each worker also holds one listener connection on the primary, outside its pool
+    listener = 1 if configured.INVALIDATION_LISTENER_ENABLED else 0
+    max_size = configured.DB_POOL_MAX_SIZE
+    sized = False
+    for index, budget in enumerate(budgets):
+        server = f"replica {index}" if index else "primary"
+        if isinstance(budget, Exception):
+            logger.warning(f"Could not read max_connections on the {server}: {budget}")
+            continue
+        max_size = min(max_size, budget // workers - (0 if index else listener))
+        sized = True
+        logger.info(f"{budget} database connections on the {server} for {workers} workers")
+    if sized:
+        max_size = max(1, max_size)
+        os.environ["DB_POOL_MAX_SIZE"] = str(max_size)
+        os.environ["DB_POOL_MIN_SIZE"] = str(min(configured.DB_POOL_MIN_SIZE, max_size))
+        logger.info(f"Pool max_size {max_size} per worker and server")
+    else:
+        logger.warning("Keeping the configured pool sizes")
+    if not configured.PASSWORD_HASH_WORKERS:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+
+def preload():
+    started = time.perf_counter()
+    import main  # noqa: F401
+
+    logger.info(f"App imported in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+def run(args, configured: Settings):
+    os.environ["SERVER_LAUNCHED_AT"] = str(time.time())
+    workers = args.workers or os.cpu_count() or 1
+    size_worker_pools(configured, workers)
+    if workers > 1 and configured.RATE_LIMIT_BACKEND == "memory":
+        logger.warning(
+            "Rate limits are counted per worker with the memory backend; "
+            "set RATE_LIMIT_BACKEND=postgres to share them"
+        )
+    preload()
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        access_log=configured.SERVER_ACCESS_LOG,
+        timeout_graceful_shutdown=configured.SERVER_GRACEFUL_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    # not the cached app settings: those must be built after sizing
+    configured = Settings()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=configured.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=configured.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=configured.SERVER_WORKERS)
+    run(parser.parse_args(), configured)
@@ -1,10 +1,27 @@
+import json
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from datetime import datetime, timedelta
 
-from utils.tokens import generate_token, get_hash_token
+from utils.revocation import revoked_users
+from utils.tokens import (
+    EMBEDDED_CLAIMS,
+    decode_token,
+    generate_token,
+    get_hash_token,
+)
 from schemas.user import User, UserCreate, UserInDB, UserLogin
 from database.connection_db import connection
-from utils.password import get_password_hash, verify_password
+from services.email_verification import email_verification
+from services.mail_dispatcher import mail_dispatcher
+from utils.bloom import login_filter
+from utils.metrics import auth_outcomes
+from utils.password import (
+    get_password_hash_async,
+    verify_and_update_password_async,
+    verify_dummy_password,
+)
+from utils.user_cache import user_cache
 from config.config import settings
 import asyncpg
 
@@ -15,11 +32,14 @@ class AuthService:
         user: UserCreate,
         db_pool: asyncpg.Pool = Depends(connection.get_connection),
     ):
+        """Insert the user, its verification token and the verification email
+        in a single statement."""
         user.email = user.email.lower()
 
         user.username = user.username.lower()
         plain_password = user.password.get_secret_value()
-        hashed_pwd = get_password_hash(plain_password)
+        hashed_pwd = await get_password_hash_async(plain_password)
+        now = datetime.now()
         user_db = UserInDB(
             username=user.username,
             email=user.email,
@@ -28,18 +48,17 @@ class AuthService:
             hash_password=hashed_pwd,
             is_active=True,
             is_verified=False,
-            created_at=datetime.now(),
-            updated_at=datetime.now(),
+            created_at=now,
+            updated_at=now,
+        )
+        token, hashed_token, token_expires_at = email_verification.new_token()
+        email = email_verification.verification_email(
+            user_db.model_dump(include={"email", "username"}), token
         )
 
-        insert_query = """
-            INSERT INTO users (username, email, hashed_password, first_name, last_name, is_verified, is_active, created_at, updated_at)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-            RETURNING user_id, email, username, first_name, last_name
-            """
         async with db_pool.acquire() as conn:
-            result = await conn.fetchrow(
-                insert_query,
+            result = await conn.fetchrow_named(
+                "register_user",
                 user_db.username,
                 user_db.email,
                 user_db.hash_password,
@@ -49,66 +68,188 @@ class AuthService:
                 user_db.is_active,
                 user_db.created_at,
                 user_db.updated_at,
+                hashed_token,
+                token_expires_at,
+                email_verification.subject,
+                email_verification.template,
+                json.dumps(email.body),
+                now.timestamp(),
+            )
+        if result is None:
+            auth_outcomes.labels("register", "conflict").inc()
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="The provided email or username already exists",
             )
-            return result
+        auth_outcomes.labels("register", "created").inc()
+        connection.mark_written(result.get("user_id"))
+        login_filter.add(result.get("email"), result.get("username"))
+        mail_dispatcher.notify()
+        return result
 
     async def login_user(
         self,
         user: UserLogin,
         db_pool: asyncpg.Pool = Depends(connection.get_connection),
     ):
-        username = user.email or user.username
-        fetch_user = "SELECT * FROM users WHERE username = $1 OR email = $1"
-        async with db_pool.acquire() as conn:
-            result = await conn.fetchrow(fetch_user, username)
+        statement = "login_by_email" if user.email else "login_by_username"
+        login = (user.email or user.username or "").lower()
+        result = None
+        if login_filter.might_exist(login):
+            async with db_pool.acquire() as conn:
+                result = await conn.fetchrow_named(statement, login)
         if not result:
+            await verify_dummy_password(user.password)
+            auth_outcomes.labels("login", "unknown_user").inc()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="This user doesn't exist",
             )
         result = dict(result)
-        if not verify_password(user.password, result.get("hashed_password")):
+        valid, new_hash = await verify_and_update_password_async(
+            user.password, result.get("hashed_password")
+        )
+        if not valid:
+            auth_outcomes.labels("login", "bad_password").inc()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Incorrect password",
             )
+        if new_hash is not None:
+            # imported bcrypt or outdated Argon2; the old hash guards against
+            # a password change that landed in between
+            async with db_pool.acquire() as conn:
+                await conn.execute_named(
+                    "rehash_password",
+                    result.get("user_id"),
+                    result.get("hashed_password"),
+                    new_hash,
+                )
+            auth_outcomes.labels("login", "rehashed").inc()
         if not result.get("is_active"):
+            auth_outcomes.labels("login", "suspended").inc()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="This account is suspended currently",
             )
         if not result.get("is_verified"):
+            auth_outcomes.labels("login", "unverified").inc()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="This account is unverified. Verify your email",
             )
+        auth_outcomes.labels("login", "success").inc()
         return result
 
+    def generate_access_token(self, user_id: str, claims: Optional[dict] = None):
+        access_data = {"user_id": user_id}
+        if settings.ACCESS_TOKEN_EMBED_CLAIMS and claims:
+            access_data |= {claim: claims.get(claim) for claim in EMBEDDED_CLAIMS}
+        return generate_token(
+            access_data, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        )
+
     async def generate_and_store_tokens(
         self,
         user_id: str,
         db_pool: asyncpg.Pool = Depends(connection.get_connection),
+        claims: Optional[dict] = None,
+        record_login: bool = False,
+        user_agent: Optional[str] = None,
+        ip: Optional[str] = None,
     ):
-        user_data = {"user_id": user_id}
-        access_token = generate_token(
-            user_data, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
+        access_token = self.generate_access_token(user_id, claims)
         refresh_token = generate_token(
-            user_data,
+            {"user_id": user_id},
             timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
             token_type="refresh",
         )
         hashed_refresh = get_hash_token(refresh_token)
-        refresh_token_query = """
-        INSERT INTO refresh_tokens (user_id, token, expires_at, created_at)
-        VALUES ($1, $2, $3, $4)
-        """
-        expires_at = datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        statement = (
+            "insert_refresh_token_on_login" if record_login else "insert_refresh_token"
+        )
+        now = datetime.now()
+        expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
         async with db_pool.acquire() as conn:
-            await conn.fetchrow(
-                refresh_token_query, user_id, hashed_refresh, expires_at, datetime.now()
+            await conn.execute_named(
+                statement, user_id, hashed_refresh, expires_at, now, user_agent, ip
             )
         return {"access_token": access_token, "refresh_token": refresh_token}
 
+    async def rotate_refresh_token(
+        self,
+        refresh_token: str,
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+        user_agent: Optional[str] = None,
+        ip: Optional[str] = None,
+    ):
+        try:
+            user_id = decode_token(refresh_token, cache=False).get("user_id")
+        except HTTPException:
+            auth_outcomes.labels("refresh", "invalid").inc()
+            raise
+        new_refresh_token = generate_token(
+            {"user_id": user_id},
+            timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+            token_type="refresh",
+        )
+        now = datetime.now()
+        expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        async with db_pool.acquire() as conn:
+            result = await conn.fetchrow_named(
+                "rotate_refresh_token",
+                get_hash_token(refresh_token),
+                get_hash_token(new_refresh_token),
+                expires_at,
+                now,
+                user_agent,
+                ip,
+            )
+        if not result or result.get("expires_at") < now:
+            auth_outcomes.labels("refresh", "invalid").inc()
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
+            )
+        if result.get("user_id") is None:
+            auth_outcomes.labels("refresh", "unknown_user").inc()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User Not Found"
+            )
+        user_data = dict(result)
+        if not user_data.get("is_active"):
+            auth_outcomes.labels("refresh", "suspended").inc()
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail="This user is not active"
+            )
+        if not user_data.get("rotated"):
+            auth_outcomes.labels("refresh", "reused").inc()
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized access"
+            )
+        auth_outcomes.labels("refresh", "success").inc()
+        user_id = str(user_data.get("user_id"))
+        return {
+            "user": user_data,
+            "access_token": self.generate_access_token(user_id, user_data),
+            "refresh_token": new_refresh_token,
+        }
+
+    async def set_user_active(
+        self,
+        user_id: str,
+        is_active: bool,
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+    ):
+        now = datetime.now()
+        async with db_pool.acquire() as conn:
+            await conn.execute_named(
+                "set_user_active", user_id, is_active, now, now.timestamp()
+            )
+        connection.mark_written(user_id)
+        # other workers apply the same through the invalidation listener
+        user_cache.invalidate(user_id)
+        if not is_active:
+            revoked_users.revoke(user_id, now.timestamp())
+
 
 auth = AuthService()
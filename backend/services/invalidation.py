@@ -0,0 +1,144 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import asyncpg
+from loguru import logger
+
+from config.config import settings
+from database.connection_db import connection
+from database.queries import AUTH_EVENTS_CHANNEL
+from utils.bloom import login_filter
+from utils.metrics import invalidation_lag
+from utils.revocation import revoked_users
+from utils.user_cache import user_cache
+
+
+REVOKING_EVENTS = {"revoked", "suspended"}
+
+
+class InvalidationListener:
+    """Applies user changes committed by any worker to this worker's caches.
+
+    A dedicated connection LISTENs on AUTH_EVENTS_CHANNEL. Events are
+    idempotent, so the publishing worker receiving its own is harmless.
+    Notifications sent while the connection is down are lost, so every
+    (re)connect resyncs: the user cache is cleared, recent revocations are
+    reloaded from users.sessions_revoked_at and the login filter catches up
+    on registrations. The login filter only trusts its misses while the
+    listener is connected.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.conn: Optional[asyncpg.Connection] = None
+        self.connected = False
+        self.events = 0
+        self.malformed = 0
+        self.resyncs = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+
+    def start(self, db_pool: asyncpg.Pool):
+        if not settings.INVALIDATION_LISTENER_ENABLED or self.task is not None:
+            return
+        self.task = asyncio.create_task(self._loop(db_pool))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _loop(self, db_pool: asyncpg.Pool):
+        failures = 0
+        while True:
+            lost = asyncio.Event()
+            try:
+                self.conn = await connection.connect_listener()
+                self.conn.add_termination_listener(lambda conn: lost.set())
+                # listening before the resync, so no change falls in between
+                await self.conn.add_listener(AUTH_EVENTS_CHANNEL, self._on_event)
+                await self.resync(db_pool)
+                self.connected = login_filter.listening = True
+                self.last_error = None
+                failures = 0
+                await self._watch(lost)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Invalidation listener disconnected: {e}")
+            finally:
+                self.connected = login_filter.listening = False
+                if self.conn is not None:
+                    self.conn.terminate()
+                    self.conn = None
+            failures += 1
+            self.reconnects += 1
+            await asyncio.sleep(
+                min(settings.INVALIDATION_RECONNECT_MAX_SECONDS, 0.5 * 2**failures)
+            )
+
+    async def _watch(self, lost: asyncio.Event):
+        interval = settings.INVALIDATION_HEALTHCHECK_SECONDS
+        while True:
+            try:
+                await asyncio.wait_for(lost.wait(), interval)
+                raise ConnectionError("listener connection closed")
+            except asyncio.TimeoutError:
+                # a connection dropped without a FIN only shows up when used
+                await self.conn.fetchval("SELECT 1", timeout=interval)
+
+    async def resync(self, db_pool: asyncpg.Pool):
+        since = datetime.now() - timedelta(seconds=revoked_users.ttl)
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch_named("recent_revocations", since)
+        user_cache.clear()
+        revoked_users.merge(
+            {str(row["user_id"]): row["sessions_revoked_at"].timestamp() for row in rows}
+        )
+        if login_filter.ready:
+            await login_filter.sync(db_pool)
+        self.resyncs += 1
+        logger.info(f"Invalidation listener resynced: {len(rows)} recent revocations")
+
+    def _on_event(self, conn, pid: int, channel: str, payload: str):
+        try:
+            event = json.loads(payload)
+            kind, user_id, at = event["event"], event["user_id"], float(event["at"])
+            if kind == "created":
+                login_filter.add(event["email"], event["username"])
+            elif kind == "imported":
+                login_filter.mark_stale()
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.malformed += 1
+            logger.warning(f"Ignoring malformed auth event: {payload!r}")
+            return
+        if user_id is not None:
+            user_cache.invalidate(user_id)
+        if kind in REVOKING_EVENTS:
+            revoked_users.revoke(user_id, at)
+        self.events += 1
+        invalidation_lag.labels(kind).observe(max(0.0, time.time() - at))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.INVALIDATION_LISTENER_ENABLED,
+            "connected": self.connected,
+            "events": self.events,
+            "malformed": self.malformed,
+            "resyncs": self.resyncs,
+            "reconnects": self.reconnects,
+            "revoked_users": len(revoked_users),
+            "last_error": self.last_error,
+        }
+
+
+invalidation_listener = InvalidationListener()
@@ -0,0 +1,183 @@
+import asyncio
+import re
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+import asyncpg
+from loguru import logger
+
+from config.config import settings
+
+
+PARTITION_NAME = re.compile(r"^refresh_tokens_p(\d{4})(\d{2})$")
+
+# not a registry statement: the table only exists once refresh_tokens is partitioned
+PURGE_DEFAULT_PARTITION = """
+DELETE FROM refresh_tokens_default WHERE refresh_id IN (
+    SELECT refresh_id FROM refresh_tokens_default
+    WHERE expires_at < $1
+    LIMIT $2
+    FOR UPDATE SKIP LOCKED
+)
+"""
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class TokenJanitor:
+    """Deletes expired, revoked and used token rows in small batches.
+
+    Refresh tokens, revoked or not, are kept until they expire, so reuse
+    detection works for the whole life of a stolen token. Used verification
+    rows are kept for JANITOR_RETENTION_HOURS so the "already used" message
+    keeps working for recent replays. Outbox emails the dispatcher gave up
+    on are kept for the same window.
+
+    When refresh_tokens is partitioned (tools/partition_refresh_tokens.py),
+    expired months are dropped whole instead, and only the default partition,
+    which catches expiries no monthly partition covers, is purged by batch.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.removed = {
+            "refresh_tokens": 0,
+            "email_verification": 0,
+            "email_outbox": 0,
+            "rate_limits": 0,
+        }
+        self.partitions_dropped = 0
+        self.runs = 0
+        self.last_run_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def start(self, db_pool: asyncpg.Pool):
+        if not settings.JANITOR_ENABLED or self.task is not None:
+            return
+        self.task = asyncio.create_task(self._loop(db_pool))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _loop(self, db_pool: asyncpg.Pool):
+        while True:
+            try:
+                await self.run_once(db_pool)
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Token janitor run failed: {e}")
+            await asyncio.sleep(settings.JANITOR_INTERVAL_SECONDS)
+
+    async def run_once(self, db_pool: asyncpg.Pool):
+        started = time.perf_counter()
+        now = datetime.now()
+        retained_since = now - timedelta(hours=settings.JANITOR_RETENTION_HOURS)
+        async with db_pool.acquire() as conn:
+            partitioned = await conn.fetchval_named("refresh_tokens_partitioned")
+        if partitioned:
+            await self.maintain_partitions(db_pool, now)
+            self.removed["refresh_tokens"] += await self._batches(
+                db_pool,
+                lambda conn: conn.execute(
+                    PURGE_DEFAULT_PARTITION, now, settings.JANITOR_BATCH_SIZE
+                ),
+            )
+        else:
+            self.removed["refresh_tokens"] += await self._drain(
+                db_pool, "purge_refresh_tokens", now
+            )
+        self.removed["email_verification"] += await self._drain(
+            db_pool, "purge_verification_tokens", now, retained_since
+        )
+        self.removed["email_outbox"] += await self._drain(
+            db_pool, "purge_failed_outbox", now, retained_since
+        )
+        # counters older than two windows no longer affect any decision
+        self.removed["rate_limits"] += await self._drain(
+            db_pool,
+            "purge_rate_limits",
+            now,
+            now - timedelta(seconds=2 * settings.RATE_LIMIT_WINDOW_SECONDS),
+        )
+        self.runs += 1
+        self.last_run_seconds = time.perf_counter() - started
+
+    async def _drain(self, db_pool: asyncpg.Pool, statement: str, *args) -> int:
+        """Run a purge statement, whose last parameter is the batch size,
+        until a batch comes back short."""
+        return await self._batches(
+            db_pool,
+            lambda conn: conn.execute_named(statement, *args, settings.JANITOR_BATCH_SIZE),
+        )
+
+    async def _batches(self, db_pool: asyncpg.Pool, purge) -> int:
+        removed = 0
+        pause = 1 / settings.JANITOR_MAX_BATCHES_PER_SECOND
+        while True:
+            async with db_pool.acquire() as conn:
+                status = await purge(conn)
+            deleted = int(status.split()[-1])
+            removed += deleted
+            if deleted < settings.JANITOR_BATCH_SIZE:
+                return removed
+            await asyncio.sleep(pause)
+
+    async def maintain_partitions(self, db_pool: asyncpg.Pool, now: datetime):
+        """Pre-create upcoming monthly partitions and drop fully expired ones."""
+        async with db_pool.acquire() as conn:
+            async with conn.transaction():
+                # several workers run a janitor; one maintenance pass is enough
+                if not await conn.fetchval_named("lock_partition_maintenance"):
+                    return
+                month = month_start(now.date())
+                for _ in range(settings.JANITOR_PARTITIONS_AHEAD + 1):
+                    upper = next_month(month)
+                    await conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS refresh_tokens_p{month:%Y%m} "
+                        f"PARTITION OF refresh_tokens "
+                        f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+                    )
+                    month = upper
+                partitions = await conn.fetch_named("refresh_token_partitions")
+                for partition in partitions:
+                    match = PARTITION_NAME.match(partition["relname"])
+                    if not match:
+                        continue
+                    lower = date(int(match.group(1)), int(match.group(2)), 1)
+                    if next_month(lower) > now.date():
+                        continue
+                    name = partition["relname"]
+                    await conn.execute(f"ALTER TABLE refresh_tokens DETACH PARTITION {name}")
+                    await conn.execute(f"DROP TABLE {name}")
+                    self.partitions_dropped += 1
+                    logger.info(f"Dropped expired refresh token partition {name}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.JANITOR_ENABLED,
+            "runs": self.runs,
+            "rows_removed": self.removed,
+            "partitions_dropped": self.partitions_dropped,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_error": self.last_error,
+        }
+
+
+janitor = TokenJanitor()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import TYPE_CHECKING, Optional
+
+import asyncpg
+from loguru import logger
+
+from config.config import settings
+from utils.metrics import Histogram
+
+if TYPE_CHECKING:
+    from utils.smtp import SMTPConnectionPool
+    from utils.templates import TemplateRenderer
+
+
+class MailDispatcher:
+    """Drains email_outbox over pooled SMTP sessions.
+
+    Rows are claimed in batches with SKIP LOCKED, so several workers can run
+    a dispatcher side by side. Failed sends are retried with exponential
+    backoff until MAIL_MAX_ATTEMPTS, then parked with failed_at set. A 5xx
+    reply, such as a refused recipient, parks the row on the first failure.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.smtp: Optional["SMTPConnectionPool"] = None
+        self.renderer: Optional["TemplateRenderer"] = None
+        self.wakeup = asyncio.Event()
+        self.send_latency = Histogram()
+        self.sent = 0
+        self.failed_attempts = 0
+        self.given_up = 0
+        self.batches = 0
+        self.started_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self, db_pool: asyncpg.Pool):
+        if not settings.MAIL_DISPATCHER_ENABLED or self.task is not None:
+            return
+        # aiosmtplib and Jinja are only loaded by processes that send mail
+        from utils.smtp import SMTPConnectionPool
+        from utils.templates import template_renderer
+
+        self.renderer = template_renderer
+        self.renderer.load()
+        self.smtp = SMTPConnectionPool(settings.MAIL_SMTP_POOL_SIZE)
+        self.started_at = time.monotonic()
+        self.task = asyncio.create_task(self._loop(db_pool))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        await self.smtp.close()
+
+    def notify(self):
+        """Wake the dispatcher after a local enqueue instead of waiting for the next poll."""
+        self.wakeup.set()
+
+    async def _loop(self, db_pool: asyncpg.Pool):
+        while True:
+            try:
+                if await self.dispatch_once(db_pool) == settings.MAIL_BATCH_SIZE:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Mail dispatcher run failed: {e}")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), settings.MAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def dispatch_once(self, db_pool: asyncpg.Pool) -> int:
+        now = datetime.now()
+        lease = now + timedelta(seconds=settings.MAIL_CLAIM_LEASE_SECONDS)
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch_named(
+                "claim_outbox_batch", now, lease, settings.MAIL_BATCH_SIZE
+            )
+        if not rows:
+            return 0
+        self.batches += 1
+        results = await asyncio.gather(
+            *(self._deliver(row) for row in rows), return_exceptions=True
+        )
+        sent, retry = [], []
+        for row, result in zip(rows, results):
+            if isinstance(result, BaseException):
+                retry.append((row, result))
+            else:
+                sent.append(row["outbox_id"])
+        async with db_pool.acquire() as conn:
+            if sent:
+                await conn.execute_named("delete_sent_outbox", sent)
+            if retry:
+                await conn.execute_named(
+                    "reschedule_outbox", *self._reschedule(retry, datetime.now())
+                )
+        self.sent += len(sent)
+        return len(rows)
+
+    async def _deliver(self, row: asyncpg.Record):
+        started = time.perf_counter()
+        await self.smtp.send(self._message(row))
+        self.send_latency.observe(time.perf_counter() - started)
+
+    def _message(self, row: asyncpg.Record) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+        message["To"] = row["recipient"]
+        message["Subject"] = row["subject"]
+        message.set_content(
+            self.renderer.render(row["template"], json.loads(row["context"])),
+            subtype="html",
+        )
+        return message
+
+    def _reschedule(self, failures: list, now: datetime) -> tuple:
+        ids, next_attempts, errors, give_up = [], [], [], []
+        for row, error in failures:
+            exhausted = (
+                self.smtp.is_permanent(error)
+                or row["attempts"] >= settings.MAIL_MAX_ATTEMPTS
+            )
+            delay = min(
+                settings.MAIL_RETRY_MAX_SECONDS,
+                settings.MAIL_RETRY_BASE_SECONDS * 2 ** (row["attempts"] - 1),
+            )
+            ids.append(row["outbox_id"])
+            next_attempts.append(now + timedelta(seconds=delay * random.uniform(0.5, 1.0)))
+            errors.append(str(error)[:500])
+            give_up.append(exhausted)
+            self.failed_attempts += 1
+            self.given_up += exhausted
+            self.last_error = str(error)
+            logger.warning(
+                f"Sending outbox email {row['outbox_id']} failed "
+                f"(attempt {row['attempts']}): {error}"
+            )
+        return ids, next_attempts, errors, give_up, now
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "enabled": settings.MAIL_DISPATCHER_ENABLED,
+            "smtp_pool_size": self.smtp.size if self.smtp else 0,
+            "smtp_connections_opened": self.smtp.connections_opened if self.smtp else 0,
+            "batches": self.batches,
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "given_up": self.given_up,
+            "sent_per_second": round(self.sent / uptime, 3) if uptime else 0.0,
+            "send_latency_seconds": self.send_latency.snapshot(),
+            "last_error": self.last_error,
+        }
+
+
+mail_dispatcher = MailDispatcher()
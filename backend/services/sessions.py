@@ -0,0 +1,147 @@
+import base64
+import ipaddress
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import asyncpg
+from fastapi import Depends, HTTPException, Request, status
+
+from database.connection_db import connection
+from schemas.session import Session, SessionPage
+from utils.metrics import auth_outcomes
+from utils.rate_limit import rate_limiter
+from utils.revocation import revoked_users
+from utils.tokens import get_hash_token
+
+
+MAX_USER_AGENT_LENGTH = 512
+
+# sorts after every real (created_at, refresh_id), so it starts the first page
+FIRST_PAGE = (datetime.max, uuid.UUID(int=(1 << 128) - 1))
+
+
+def client_info(request: Request) -> tuple[Optional[str], Optional[str]]:
+    """User agent and IP to store with a new refresh token."""
+    user_agent = request.headers.get("user-agent")
+    ip = rate_limiter.client_ip(request)
+    try:
+        ip = str(ipaddress.ip_address(ip))
+    except ValueError:
+        ip = None
+    return (user_agent[:MAX_USER_AGENT_LENGTH] if user_agent else None), ip
+
+
+def encode_cursor(created_at: datetime, refresh_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{refresh_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, refresh_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(refresh_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+class SessionService:
+    """A session is a live refresh token; rotation keeps its sign-in time but
+    gives it a new id."""
+
+    async def list_sessions(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        refresh_token: Optional[str] = None,
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+    ) -> SessionPage:
+        after = decode_cursor(cursor) if cursor else FIRST_PAGE
+        current_token = get_hash_token(refresh_token) if refresh_token else None
+        async with db_pool.acquire() as conn:
+            # one row more than asked tells whether another page exists
+            rows = await conn.fetch_named(
+                "list_sessions",
+                user_id,
+                datetime.now(),
+                *after,
+                current_token,
+                limit + 1,
+            )
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last.get("created_at"), last.get("refresh_id"))
+        return SessionPage(
+            sessions=[
+                Session(
+                    session_id=str(row.get("refresh_id")),
+                    signed_in_at=row.get("signed_in_at"),
+                    last_refreshed_at=row.get("created_at"),
+                    expires_at=row.get("expires_at"),
+                    user_agent=row.get("user_agent"),
+                    ip=row.get("ip"),
+                    current=row.get("current"),
+                )
+                for row in page
+            ],
+            next_cursor=next_cursor,
+        )
+
+    async def revoke_session(
+        self,
+        user_id: str,
+        session_id: uuid.UUID,
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+    ):
+        async with db_pool.acquire() as conn:
+            result = await conn.execute_named(
+                "revoke_session", session_id, user_id, datetime.now()
+            )
+        if result == "UPDATE 0":
+            auth_outcomes.labels("revoke_session", "not_found").inc()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Session not found"
+            )
+        auth_outcomes.labels("revoke_session", "revoked").inc()
+
+    async def logout(
+        self,
+        refresh_token: Optional[str],
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+    ):
+        """Revoke the presented refresh token. Its access token stays valid
+        until it expires, like any stateless token."""
+        row = None
+        if refresh_token:
+            async with db_pool.acquire() as conn:
+                row = await conn.fetchrow_named(
+                    "revoke_presented_token",
+                    get_hash_token(refresh_token),
+                    datetime.now(),
+                )
+        auth_outcomes.labels("logout", "revoked" if row else "no_session").inc()
+
+    async def logout_all(
+        self,
+        user_id: str,
+        db_pool: asyncpg.Pool = Depends(connection.get_connection),
+    ) -> int:
+        """Revoke every refresh token of the user, and the access tokens
+        issued so far."""
+        now = datetime.now()
+        async with db_pool.acquire() as conn:
+            revoked = await conn.fetchval_named(
+                "revoke_user_sessions", user_id, now, now.timestamp()
+            )
+        revoked_users.revoke(user_id, now.timestamp())
+        auth_outcomes.labels("logout_all", "success").inc()
+        return revoked
+
+
+sessions = SessionService()
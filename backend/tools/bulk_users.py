@@ -0,0 +1,317 @@
+"""Stream users into or out of the users table, for migrations and backups.
+
+Run from backend/ with the app's environment:
+
+    python -m tools.bulk_users import users.csv --verified
+    python -m tools.bulk_users import users.ndjson --workers 8 --rejects rejects.ndjson
+    python -m tools.bulk_users export users.ndjson
+    python -m tools.bulk_users export - --format csv --with-hashes > users.csv
+
+Import reads CSV (with a header row) or NDJSON, one user per row: username,
+email, first_name, last_name, and either password or hashed_password.
+is_verified and is_active are optional. A hashed_password must be Argon2, or
+bcrypt when the bcrypt package is installed; login rehashes those to current
+Argon2 the first time their owner signs in.
+
+Rows are validated and hashed in batches on a process pool. At most
+--max-pending batches are in flight, so memory stays flat whatever the file
+size. Each batch is COPYed into a temporary table, then inserted with
+ON CONFLICT DO NOTHING, so an existing email or username is skipped rather
+than overwritten, and re-running a partly loaded file is safe. Each batch
+that inserts users sends one "imported" event on the auth events channel,
+rather than one per user, so running servers stop trusting their login
+filter's misses until its next sync has picked the batch up.
+
+Only DATABASE_URL is needed; the token and mail settings can be left unset.
+
+Export streams the table through a server-side cursor; hashes are left out
+unless --with-hashes is given. user_id is exported but not imported.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+import asyncpg
+from loguru import logger
+from pydantic import ValidationError
+
+from config.config import get_database_settings
+from database.queries import AUTH_EVENTS_CHANNEL
+from schemas.user import User
+from utils.password import BcryptHasher, get_password_hash, is_supported_hash
+
+
+COLUMNS = (
+    "username", "email", "hashed_password", "first_name", "last_name",
+    "is_verified", "is_active",
+)
+
+CREATE_STAGING = """
+CREATE TEMP TABLE IF NOT EXISTS import_users (
+    username text, email text, hashed_password text, first_name text,
+    last_name text, is_verified boolean, is_active boolean
+) ON COMMIT DELETE ROWS
+"""
+
+INSERT_FROM_STAGING = """
+WITH inserted AS (
+    INSERT INTO users (username, email, hashed_password, first_name, last_name, is_verified, is_active, created_at, updated_at)
+    SELECT username, email, hashed_password, first_name, last_name, is_verified, is_active, $1, $1
+    FROM import_users
+    ON CONFLICT DO NOTHING
+    RETURNING 1
+)
+SELECT count(*) FROM inserted
+"""
+
+# delivered when the batch commits, like the per-row events of registrations
+NOTIFY_IMPORTED = f"""
+SELECT pg_notify('{AUTH_EVENTS_CHANNEL}', json_build_object(
+    'event', 'imported', 'user_id', NULL, 'at', $1::float8, 'count', $2::int)::text)
+"""
+
+COLUMN_LIMITS = """
+SELECT column_name, character_maximum_length FROM information_schema.columns
+WHERE table_name = 'users' AND character_maximum_length IS NOT NULL
+"""
+
+EXPORT_COLUMNS = (
+    "user_id", "username", "email", "first_name", "last_name",
+    "is_verified", "is_active", "created_at",
+)
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+
+
+def file_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def read_batches(path: Path, fmt: str, size: int) -> Iterator[list[tuple[int, dict]]]:
+    """(line number, row) batches, read lazily."""
+    batch = []
+    with path.open(newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = ((number, line) for number, line in enumerate(f, 1) if line.strip())
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def flag(value, default: bool) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def prepare_row(row: dict, verified: bool, limits: dict[str, int]) -> tuple:
+    user = User(
+        username=row.get("username") or "",
+        email=row.get("email") or "",
+        first_name=row.get("first_name") or "",
+        last_name=row.get("last_name") or "",
+    )
+    username, email = user.username.lower(), user.email.lower()
+    for column, value in (("username", username), ("email", email)):
+        if column in limits and len(value) > limits[column]:
+            raise ValueError(f"{column} is longer than {limits[column]} characters")
+    hashed = row.get("hashed_password")
+    if hashed:
+        if not is_supported_hash(hashed):
+            if hashed.startswith("$2") and BcryptHasher is None:
+                raise ValueError("bcrypt hash given but the bcrypt package is not installed")
+            raise ValueError("hashed_password is neither Argon2 nor bcrypt")
+    elif row.get("password"):
+        hashed = get_password_hash(row["password"])
+    else:
+        raise ValueError("password or hashed_password is required")
+    return (
+        username, email, hashed, user.first_name, user.last_name,
+        flag(row.get("is_verified"), verified), flag(row.get("is_active"), True),
+    )
+
+
+def prepare_batch(
+    batch: list[tuple[int, object]], fmt: str, verified: bool, limits: dict[str, int]
+) -> tuple[list[tuple], list[tuple[int, str]]]:
+    """Runs on the process pool: validate and hash one batch of rows."""
+    records, rejected = [], []
+    for number, row in batch:
+        try:
+            if fmt == "ndjson":
+                row = json.loads(row)
+            records.append(prepare_row(row, verified, limits))
+        except ValidationError as e:
+            error = e.errors()[0]
+            field = ".".join(str(part) for part in error["loc"])
+            rejected.append((number, f"{field}: {error['msg']}"))
+        except Exception as e:
+            rejected.append((number, str(e)))
+    return records, rejected
+
+
+class Progress:
+    def __init__(self, every: float):
+        self.every = every
+        self.started = self.last = time.perf_counter()
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.rejected = 0
+
+    def rate(self) -> float:
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    def tick(self):
+        now = time.perf_counter()
+        if now - self.last >= self.every:
+            self.last = now
+            logger.info(
+                f"{self.rows} rows: {self.inserted} inserted, {self.skipped} skipped, "
+                f"{self.rejected} rejected, {self.rate():.0f} users/s"
+            )
+
+    def summary(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "rejected": self.rejected,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "users_per_second": round(self.rate(), 1),
+            "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+async def load_batch(conn: asyncpg.Connection, records: list[tuple]) -> int:
+    async with conn.transaction():
+        await conn.copy_records_to_table("import_users", records=records, columns=COLUMNS)
+        now = datetime.now()
+        inserted = await conn.fetchval(INSERT_FROM_STAGING, now)
+        if inserted:
+            await conn.execute(NOTIFY_IMPORTED, now.timestamp(), inserted)
+        return inserted
+
+
+async def import_users(args) -> dict:
+    path = Path(args.path)
+    fmt = file_format(args.path, args.format)
+    workers = args.workers or os.cpu_count() or 1
+    progress = Progress(args.progress_seconds)
+    rejects = open(args.rejects, "w", encoding="utf-8") if args.rejects else None
+    loop = asyncio.get_running_loop()
+    # futures of batches being prepared, in file order; the bound is the back-pressure
+    pending: asyncio.Queue = asyncio.Queue(maxsize=args.max_pending or 2 * workers)
+
+    conn = await asyncpg.connect(get_database_settings().DATABASE_URL)
+    try:
+        limits = dict(await conn.fetch(COLUMN_LIMITS))
+        await conn.execute(CREATE_STAGING)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+
+            async def produce():
+                try:
+                    for batch in read_batches(path, fmt, args.batch_size):
+                        await pending.put(loop.run_in_executor(
+                            pool, prepare_batch, batch, fmt, args.verified, limits
+                        ))
+                finally:
+                    await pending.put(None)
+
+            producer = asyncio.create_task(produce())
+            try:
+                while (future := await pending.get()) is not None:
+                    records, rejected = await future
+                    progress.rows += len(records) + len(rejected)
+                    progress.rejected += len(rejected)
+                    for number, error in rejected:
+                        if rejects is not None:
+                            rejects.write(json.dumps({"line": number, "error": error}) + "\n")
+                        elif progress.rejected <= 10:
+                            logger.warning(f"line {number} rejected: {error}")
+                    if records:
+                        inserted = await load_batch(conn, records)
+                        progress.inserted += inserted
+                        progress.skipped += len(records) - inserted
+                    progress.tick()
+            finally:
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+    finally:
+        await conn.close()
+        if rejects is not None:
+            rejects.close()
+    return progress.summary()
+
+
+def export_query(with_hashes: bool) -> str:
+    columns = EXPORT_COLUMNS + (("hashed_password",) if with_hashes else ())
+    return f"SELECT {', '.join(columns)} FROM users"
+
+
+async def export_users(args) -> dict:
+    fmt = file_format(args.path, args.format)
+    output = sys.stdout if args.path == "-" else open(args.path, "w", newline="", encoding="utf-8")
+    progress = Progress(args.progress_seconds)
+    conn = await asyncpg.connect(get_database_settings().DATABASE_URL)
+    try:
+        writer = None
+        async with conn.transaction(readonly=True):
+            cursor = conn.cursor(export_query(args.with_hashes), prefetch=args.batch_size)
+            async for row in cursor:
+                if fmt == "csv":
+                    if writer is None:
+                        writer = csv.writer(output)
+                        writer.writerow(row.keys())
+                    writer.writerow(row.values())
+                else:
+                    output.write(json.dumps(dict(row), default=str) + "\n")
+                progress.rows += 1
+                progress.tick()
+    finally:
+        await conn.close()
+        if output is not sys.stdout:
+            output.close()
+    summary = progress.summary()
+    del summary["inserted"], summary["skipped"], summary["rejected"]
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("import", "export"):
+        command = commands.add_parser(name)
+        command.add_argument("path", help="file to read or write; '-' exports to stdout")
+        command.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+        command.add_argument("--batch-size", type=int, default=1000)
+        command.add_argument("--progress-seconds", type=float, default=5.0)
+    import_command = commands.choices["import"]
+    import_command.add_argument("--workers", type=int, default=0, help="hashing processes; default one per CPU")
+    import_command.add_argument("--max-pending", type=int, default=0, help="batches in flight; default 2 per worker")
+    import_command.add_argument("--verified", action="store_true", help="default is_verified for rows without one")
+    import_command.add_argument("--rejects", help="write rejected rows here as NDJSON")
+    commands.choices["export"].add_argument("--with-hashes", action="store_true")
+    args = parser.parse_args()
+    run = import_users if args.command == "import" else export_users
+    logger.info(json.dumps(asyncio.run(run(args))))
@@ -0,0 +1,136 @@
+"""Convert refresh_tokens to a table partitioned by month of expiry, or back.
+
+Run from backend/ with DATABASE_URL set, in a maintenance window: the table
+is rewritten under an exclusive lock, so logins and refreshes wait for it.
+
+    python -m tools.partition_refresh_tokens             # partition
+    python -m tools.partition_refresh_tokens --undo      # back to one table
+
+Either direction does nothing when the table already has the requested
+layout, so it is safe to re-run, and it can run at any point of the
+migration history. Columns and defaults are copied from the current table;
+the primary key gains expires_at, which partitioned unique indexes require.
+
+Once the table is partitioned, the token janitor stops deleting refresh
+token rows one batch at a time and instead:
+
+- pre-creates the monthly partitions JANITOR_PARTITIONS_AHEAD months ahead;
+- detaches and drops a month's partition once every row in it has expired;
+- purges expired rows from refresh_tokens_default in batches. Rows land in
+  the default partition when no monthly partition covers their expiry, for
+  instance when the janitor is disabled for longer than the months ahead or
+  tokens live longer than them.
+"""
+import argparse
+import asyncio
+
+import asyncpg
+from loguru import logger
+
+from config.config import get_database_settings
+
+
+INDEXES = """
+CREATE UNIQUE INDEX ix_refresh_tokens_token ON refresh_tokens (token{key});
+CREATE INDEX ix_refresh_tokens_active_sessions ON refresh_tokens (user_id, created_at, refresh_id) WHERE NOT revoked;
+CREATE INDEX ix_refresh_tokens_expires_at ON refresh_tokens (expires_at);
+"""
+
+CREATE_PARTITIONS = """
+DO $$
+DECLARE
+    month date;
+    last_month date := (date_trunc('month', now()) + interval '{months_ahead} months')::date;
+BEGIN
+    SELECT date_trunc('month', coalesce(min(expires_at), now()))::date
+    INTO month FROM refresh_tokens_old;
+    WHILE month < last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE refresh_tokens_p%s PARTITION OF refresh_tokens FOR VALUES FROM (%L) TO (%L)',
+            to_char(month, 'YYYYMM'), month, (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END $$
+"""
+
+
+async def is_partitioned(conn: asyncpg.Connection) -> bool:
+    return await conn.fetchval(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = 'refresh_tokens'::regclass"
+    )
+
+
+async def set_aside(conn: asyncpg.Connection):
+    await conn.execute("LOCK TABLE refresh_tokens IN ACCESS EXCLUSIVE MODE")
+    await conn.execute("ALTER TABLE refresh_tokens RENAME TO refresh_tokens_old")
+    await conn.execute("ALTER INDEX refresh_tokens_pkey RENAME TO refresh_tokens_old_pkey")
+
+
+async def move_rows(conn: asyncpg.Connection, key: str):
+    # both tables were created LIKE each other, so the column order matches
+    moved = await conn.execute("INSERT INTO refresh_tokens SELECT * FROM refresh_tokens_old")
+    await conn.execute("DROP TABLE refresh_tokens_old")
+    await conn.execute(INDEXES.format(key=key))
+    logger.info(f"Moved {moved.split()[-1]} refresh tokens")
+
+
+async def partition(conn: asyncpg.Connection, months_ahead: int):
+    await set_aside(conn)
+    await conn.execute(
+        "UPDATE refresh_tokens_old SET expires_at = coalesce(created_at, now()) "
+        "WHERE expires_at IS NULL"
+    )
+    await conn.execute("""
+        CREATE TABLE refresh_tokens (LIKE refresh_tokens_old INCLUDING DEFAULTS)
+        PARTITION BY RANGE (expires_at)
+    """)
+    await conn.execute("""
+        ALTER TABLE refresh_tokens
+            ALTER COLUMN expires_at SET NOT NULL,
+            ADD PRIMARY KEY (refresh_id, expires_at),
+            ADD CONSTRAINT fk_user_id FOREIGN KEY (user_id) REFERENCES users(user_id)
+    """)
+    await conn.execute("CREATE TABLE refresh_tokens_default PARTITION OF refresh_tokens DEFAULT")
+    await conn.execute(CREATE_PARTITIONS.format(months_ahead=months_ahead))
+    await move_rows(conn, ", expires_at")
+
+
+async def unpartition(conn: asyncpg.Connection):
+    await set_aside(conn)
+    await conn.execute(
+        "CREATE TABLE refresh_tokens (LIKE refresh_tokens_old INCLUDING DEFAULTS)"
+    )
+    await conn.execute("""
+        ALTER TABLE refresh_tokens
+            ADD PRIMARY KEY (refresh_id),
+            ADD CONSTRAINT fk_user_id FOREIGN KEY (user_id) REFERENCES users(user_id)
+    """)
+    await move_rows(conn, "")
+
+
+async def main(args):
+    conn = await asyncpg.connect(get_database_settings().DATABASE_URL)
+    try:
+        partitioned = await is_partitioned(conn)
+        if partitioned != args.undo:
+            state = "partitioned" if partitioned else "a single table"
+            logger.info(f"refresh_tokens is already {state}; nothing to do")
+            return
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL lock_timeout = '{args.lock_timeout}s'")
+            if args.undo:
+                await unpartition(conn)
+            else:
+                await partition(conn, args.months_ahead)
+        logger.info("refresh_tokens is now " + ("a single table" if args.undo else "partitioned"))
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--undo", action="store_true", help="merge the partitions back into one table")
+    parser.add_argument("--months-ahead", type=int, default=3, help="monthly partitions to create past this month")
+    parser.add_argument("--lock-timeout", type=float, default=10.0, help="seconds to wait for the table lock")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,217 @@
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from typing import Optional
+
+import asyncpg
+from loguru import logger
+
+from config.config import settings
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for capacity at fp_rate."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(capacity, 1)
+        self.fp_rate = fp_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # double hashing: k positions from the two halves of one 128-bit digest
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        bits = self.bits
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        # re-adding a known item leaves the count, and the fp estimate, alone
+        self.count += added
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def expected_fp_rate(self) -> float:
+        """False-positive rate for the number of items added so far."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class LoginFilter:
+    """Bloom filter of every lowercased username and email in users.
+
+    A miss means the login certainly does not exist, so login can answer
+    without a query. The filter is built in the background at startup with a
+    server-side cursor and takes registrations from every worker as they
+    commit, through the invalidation listener. A created_at watermark sync
+    catches up after the listener reconnects, and a periodic rebuild picks up
+    rows inserted with an old created_at.
+
+    A miss is only trusted while the listener is connected and the last sync
+    is recent; otherwise every lookup is a "maybe" and login queries. Bulk
+    imports announce a batch instead of each user, so mark_stale() also stops
+    trusting misses until a sync that started after it has run.
+    """
+
+    # rows committed slightly out of created_at order are caught by re-reading
+    # this far behind the watermark; adding an item twice is harmless
+    WATERMARK_OVERLAP = timedelta(minutes=1)
+    # missed syncs after which a miss no longer proves anything
+    STALE_AFTER_SYNCS = 3
+
+    def __init__(self):
+        self.filter: Optional[BloomFilter] = None
+        self.watermark: Optional[datetime] = None
+        self.task: Optional[asyncio.Task] = None
+        # set by the invalidation listener while registrations reach add()
+        self.listening = False
+        self.built_at = 0.0
+        self.synced_at = 0.0
+        self.stale_at = float("-inf")
+        self.builds = 0
+        self.skipped_queries = 0
+        self.unsure_misses = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.filter is not None
+
+    @property
+    def trusted(self) -> bool:
+        """Whether a miss proves the login does not exist."""
+        stale_after = self.STALE_AFTER_SYNCS * settings.USER_FILTER_SYNC_SECONDS
+        return (
+            self.filter is not None
+            and self.listening
+            and time.monotonic() - self.synced_at < stale_after
+            and self.synced_at > self.stale_at
+        )
+
+    def start(self, db_pool: asyncpg.Pool):
+        if not settings.USER_FILTER_ENABLED or self.task is not None:
+            return
+        self.task = asyncio.create_task(self._loop(db_pool))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def _loop(self, db_pool: asyncpg.Pool):
+        while True:
+            try:
+                if (
+                    self.filter is None
+                    or self.filter.count > self.filter.capacity
+                    or time.monotonic() - self.built_at > settings.USER_FILTER_REBUILD_SECONDS
+                ):
+                    await self.build(db_pool)
+                else:
+                    await self.sync(db_pool)
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Login filter refresh failed: {e}")
+            await asyncio.sleep(settings.USER_FILTER_SYNC_SECONDS)
+
+    async def build(self, db_pool: asyncpg.Pool):
+        async with db_pool.acquire() as conn:
+            users = await conn.fetchval_named("estimate_users")
+            # two entries per user, with room for the table to double
+            bloom = BloomFilter(
+                max(settings.USER_FILTER_CAPACITY, 4 * users),
+                settings.USER_FILTER_FP_RATE,
+            )
+            watermark = None
+            async with conn.transaction():
+                # small batches keep each stretch of hashing between awaits short
+                async for row in await conn.cursor_named("all_logins", prefetch=1000):
+                    bloom.add(row["email"].lower())
+                    bloom.add(row["username"].lower())
+                    created_at = row["created_at"]
+                    if created_at and (watermark is None or created_at > watermark):
+                        watermark = created_at
+        self.filter, self.watermark = bloom, watermark
+        self.built_at = time.monotonic()
+        self.builds += 1
+        # registrations that landed while the cursor ran went to the old filter
+        await self.sync(db_pool)
+        logger.info(
+            f"Login filter built: {bloom.count} entries, {len(bloom.bits)} bytes"
+        )
+
+    async def sync(self, db_pool: asyncpg.Pool):
+        since = self.watermark - self.WATERMARK_OVERLAP if self.watermark else datetime.min
+        started = time.monotonic()
+        async with db_pool.acquire() as conn:
+            rows = await conn.fetch_named("users_created_since", since)
+        for row in rows:
+            self.add(row["email"], row["username"])
+            if self.watermark is None or row["created_at"] > self.watermark:
+                self.watermark = row["created_at"]
+        # rows committed while the query ran may be missing, so the sync
+        # only vouches for what had committed when it started
+        self.synced_at = started
+
+    def mark_stale(self):
+        self.stale_at = time.monotonic()
+
+    def add(self, email: str, username: str):
+        if self.filter is not None:
+            self.filter.add(email.lower())
+            self.filter.add(username.lower())
+
+    def might_exist(self, login: str) -> bool:
+        if self.filter is None or login.lower() in self.filter:
+            return True
+        if not self.trusted:
+            self.unsure_misses += 1
+            return True
+        self.skipped_queries += 1
+        return False
+
+    def stats(self) -> dict:
+        bloom = self.filter
+        return {
+            "enabled": settings.USER_FILTER_ENABLED,
+            "ready": bloom is not None,
+            "trusted": self.trusted,
+            "listening": self.listening,
+            "builds": self.builds,
+            "entries": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "memory_bytes": len(bloom.bits) if bloom else 0,
+            "hash_functions": bloom.hashes if bloom else 0,
+            "expected_fp_rate": round(bloom.expected_fp_rate(), 6) if bloom else None,
+            "skipped_queries": self.skipped_queries,
+            "unsure_misses": self.unsure_misses,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "last_error": self.last_error,
+        }
+
+
+login_filter = LoginFilter()
@@ -1,9 +1,12 @@
-from typing import Annotated
-import asyncpg
-from fastapi import Cookie, Depends, HTTPException, status
+import secrets
+from typing import Annotated, Optional
+from fastapi import Cookie, Depends, Header, HTTPException, status
 from jwt import InvalidTokenError, ExpiredSignatureError
-from utils.tokens import decode_token
+from utils.revocation import revoked_users
+from utils.tokens import EMBEDDED_CLAIMS, decode_token
+from utils.user_cache import user_cache
 from database.connection_db import connection
+from config.config import settings
 
 
 def get_access_token(access_token: Annotated[str, Cookie()]):
@@ -17,7 +20,6 @@ def get_access_token(access_token: Annotated[str, Cookie()]):
 
 async def get_current_user(
     token: Annotated[str, Depends(get_access_token)],
-    db_pool: asyncpg.Pool = Depends(connection.get_connection),
 ):
     try:
         payload = decode_token(token)
@@ -27,14 +29,31 @@ async def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        get_user_query = "SELECT * FROM users WHERE user_id = $1"
+        if revoked_users.is_revoked(user_id, payload.get("iat", 0)):
+            # signed out everywhere or suspended after this token was issued
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+            )
+        if "is_active" in payload:
+            return {"user_id": user_id} | {
+                claim: payload.get(claim) for claim in EMBEDDED_CLAIMS
+            }
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+        # a freshly issued token means a recent login, possibly right after
+        # verification, so read-your-writes sends it to the primary
+        db_pool = connection.read_pool(user_id, payload.get("iat"))
         async with db_pool.acquire() as conn:
-            user = await conn.fetchrow(get_user_query, user_id)
+            user = await conn.fetchrow_named("user_by_id", user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
+        user = dict(user)
+        user_cache.set(user_id, user)
         return user
     except ExpiredSignatureError:
         raise HTTPException(
@@ -65,3 +84,19 @@ def get_current_active_user(user=Depends(get_current_user)):
             detail="Please verify your email first",
         )
     return user
+
+
+def require_monitoring_token(authorization: Annotated[Optional[str], Header()] = None):
+    """Guards /stats and /metrics, which are off unless MONITORING_TOKEN is set
+    and then need it as a bearer token."""
+    if not settings.MONITORING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.MONITORING_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,90 @@
+"""Local verification of our access tokens for other services.
+
+Needs only PyJWT with cryptography and none of this service's settings, so
+it can be imported or copied as-is:
+
+    verifier = JWKSVerifier("https://auth.example.com/.well-known/jwks.json")
+    claims = verifier.verify(request.cookies["access_token"])
+
+verify raises jwt.InvalidTokenError subclasses, like jwt.decode. Key fetches
+use blocking urllib; they happen once per max-age, so an async service can
+call verify on the event loop or move the rare refresh to a thread.
+"""
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+import jwt
+
+
+class JWKSVerifier:
+    """Verifies tokens against a cached copy of the auth service's JWKS.
+
+    The key set is revalidated with If-None-Match once the Cache-Control
+    max-age it was served with runs out, so an unchanged set costs a 304. A
+    token signed by a kid not seen yet, i.e. right after a rotation, triggers
+    at most one refresh per min_refresh_seconds; if the auth service is down
+    the keys already held keep working.
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        algorithms: tuple[str, ...] = ("EdDSA", "ES256", "ES384", "RS256"),
+        max_age: float = 300.0,
+        min_refresh_seconds: float = 30.0,
+        timeout: float = 5.0,
+    ):
+        self.jwks_url = jwks_url
+        self.algorithms = algorithms
+        self.default_max_age = max_age
+        self.max_age = max_age
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+        self.keys: dict[Optional[str], jwt.PyJWK] = {}
+        self.etag: Optional[str] = None
+        self.fetched_at = float("-inf")
+        self.fetches = 0
+
+    def refresh(self):
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        request = urllib.request.Request(self.jwks_url, headers=headers)
+        self.fetches += 1
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                jwk_set = jwt.PyJWKSet.from_dict(json.load(response))
+                self.keys = {key.key_id: key for key in jwk_set.keys}
+                self.etag = response.headers.get("ETag")
+                cache_control = response.headers.get("Cache-Control", "")
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+            cache_control = e.headers.get("Cache-Control", "")
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        self.max_age = int(max_age.group(1)) if max_age else self.default_max_age
+        self.fetched_at = time.monotonic()
+
+    def signing_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        age = time.monotonic() - self.fetched_at
+        key = self.keys.get(kid)
+        if age > self.max_age or (key is None and age > self.min_refresh_seconds):
+            try:
+                self.refresh()
+            except (OSError, jwt.PyJWKSetError):
+                if not self.keys:
+                    raise jwt.InvalidTokenError("Signing keys are unavailable")
+                # keep the keys we have and try again after min_refresh_seconds
+                self.fetched_at = time.monotonic() - self.max_age + self.min_refresh_seconds
+            key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return key
+
+    def verify(self, token: str) -> dict:
+        key = self.signing_key(jwt.get_unverified_header(token).get("kid"))
+        if key.algorithm_name not in self.algorithms:
+            raise jwt.InvalidAlgorithmError("The key's algorithm is not allowed")
+        return jwt.decode(token, key.key, algorithms=[key.algorithm_name])
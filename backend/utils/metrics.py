@@ -0,0 +1,245 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional, Union
+
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": buckets}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+Sample = Union[Histogram, Counter, int, float]
+
+
+class Family:
+    """One metric name with its label names; a child per label combination.
+
+    Children are created on first use and kept, so hot paths can hold on to
+    ``family.labels(...)`` instead of looking it up per request.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: tuple[str, ...], factory):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.factory = factory
+        self.children: dict[tuple[str, ...], Sample] = {}
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children[values] = self.factory()
+        return child
+
+    def samples(self) -> dict[tuple[str, ...], Sample]:
+        return self.children
+
+
+class CollectedFamily(Family):
+    """A family whose samples are read from existing stats at scrape time."""
+
+    def __init__(self, name, help, kind, labelnames, source: Callable[[], dict]):
+        super().__init__(name, help, kind, labelnames, None)
+        self.source = source
+
+    def samples(self) -> dict[tuple[str, ...], Sample]:
+        return self.source()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.families: dict[str, Family] = {}
+
+    def _register(self, family: Family) -> Family:
+        if family.name in self.families:
+            raise ValueError(f"Metric {family.name} is already registered")
+        self.families[family.name] = family
+        return family
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Family:
+        return self._register(Family(name, help, "histogram", labelnames, Histogram))
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Family:
+        return self._register(Family(name, help, "counter", labelnames, Counter))
+
+    def collect(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: tuple[str, ...],
+        source: Callable[[], dict],
+    ) -> Family:
+        """Expose values kept elsewhere; source returns {label values: sample}."""
+        return self._register(CollectedFamily(name, help, kind, labelnames, source))
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families.values():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, sample in family.samples().items():
+                if isinstance(sample, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(sample.buckets, sample.counts):
+                        cumulative += count
+                        labels = _labels(family.labelnames, values, f'le="{bound}"')
+                        lines.append(f"{family.name}_bucket{labels} {cumulative}")
+                    labels = _labels(family.labelnames, values, 'le="+Inf"')
+                    lines.append(f"{family.name}_bucket{labels} {sample.count}")
+                    labels = _labels(family.labelnames, values)
+                    lines.append(f"{family.name}_sum{labels} {sample.sum}")
+                    lines.append(f"{family.name}_count{labels} {sample.count}")
+                else:
+                    value = sample.value if isinstance(sample, Counter) else sample
+                    lines.append(f"{family.name}{_labels(family.labelnames, values)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+request_latency = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time from request start to response end, by route template.",
+    ("method", "route", "status"),
+)
+stage_latency = metrics.histogram(
+    "auth_stage_duration_seconds",
+    "Time spent in one stage of an auth request, by route template.",
+    ("route", "stage"),
+)
+invalidation_lag = metrics.histogram(
+    "auth_invalidation_lag_seconds",
+    "Time from a committed user change to this worker applying it.",
+    ("event",),
+)
+auth_outcomes = metrics.counter(
+    "auth_outcomes_total",
+    "Results of auth actions, successful or not.",
+    ("action", "outcome"),
+)
+
+
+# scope of the HTTP request being served, set by MetricsMiddleware; the
+# router adds the matched route to it before the endpoint runs
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    scope = request_scope.get()
+    if scope is None:
+        return "none"
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class Stage:
+    """One stage of stage_latency, observed under the route being served.
+
+    The child histogram of each route is bound on first use and kept.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children: dict[str, Histogram] = {}
+
+    def observe(self, value: float):
+        route = current_route()
+        child = self.children.get(route)
+        if child is None:
+            child = self.children[route] = stage_latency.labels(route, self.name)
+        child.observe(value)
+
+
+_stages: dict[str, Stage] = {}
+
+
+def stage_timer(name: str) -> Stage:
+    timer = _stages.get(name)
+    if timer is None:
+        timer = _stages[name] = Stage(name)
+    return timer
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route and status.
+
+    The route label is the matched path template, never the raw path, so
+    ids in URLs do not create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_scope.reset(token)
+            # the router stores the matched route in the shared scope
+            route = scope.get("route")
+            request_latency.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code),
+            ).observe(time.perf_counter() - started)
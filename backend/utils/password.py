@@ -1,7 +1,30 @@
+import asyncio
+import os
+import secrets
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from loguru import logger
 from pwdlib import PasswordHash
+from pwdlib.exceptions import HasherNotAvailable
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+from config.config import settings
+from utils.metrics import stage_timer
+
+try:
+    from pwdlib.hashers.bcrypt import BcryptHasher
+except HasherNotAvailable:
+    BcryptHasher = None
 
 
-password_hash = PasswordHash.recommended()
+# new hashes are Argon2; bcrypt, when installed, only verifies imported
+# hashes until their owner logs in and gets rehashed
+password_hash = PasswordHash(
+    (Argon2Hasher(),) + ((BcryptHasher(),) if BcryptHasher is not None else ())
+)
+HASH_QUEUE = stage_timer("password_queue")
 
 
 def get_password_hash(password: str):
@@ -10,3 +33,110 @@ def get_password_hash(password: str):
 
 def verify_password(new_pwd, hashed_pwd):
     return password_hash.verify(new_pwd, hashed_pwd)
+
+
+def verify_and_update_password(new_pwd, hashed_pwd) -> tuple[bool, Optional[str]]:
+    """Verify, and return a fresh Argon2 hash when the stored one is bcrypt or
+    uses outdated parameters."""
+    return password_hash.verify_and_update(new_pwd, hashed_pwd)
+
+
+def is_supported_hash(hashed_pwd: str) -> bool:
+    return any(hasher.identify(hashed_pwd) for hasher in password_hash.hashers)
+
+
+class PasswordHasherPool:
+    """Runs Argon2 work off the event loop with a bounded number of jobs in flight."""
+
+    def __init__(self):
+        self.executor: Optional[Executor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.max_concurrency = 0
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.dummy_hash: Optional[str] = None
+
+    def start(self):
+        if self.executor is not None:
+            return
+        workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password-hash"
+            )
+        self.max_concurrency = settings.PASSWORD_HASH_MAX_CONCURRENCY or workers
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.info(
+            f"Password hasher started: {settings.PASSWORD_HASH_EXECUTOR} pool, "
+            f"{workers} workers, {self.max_concurrency} concurrent jobs"
+        )
+
+    async def shutdown(self):
+        if self.executor is None:
+            return
+        executor, self.executor, self.semaphore = self.executor, None, None
+        # waiting for in-flight hashes would otherwise block the event loop
+        await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def run(self, func, *args, stage: str = "password_hash"):
+        if self.executor is None:
+            self.start()
+        # jobs still queued when shutdown() runs fail on the closed executor
+        executor, semaphore = self.executor, self.semaphore
+        self.waiting += 1
+        queued = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        HASH_QUEUE.observe(started - queued)
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            semaphore.release()
+            stage_timer(stage).observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "executor": settings.PASSWORD_HASH_EXECUTOR,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+        }
+
+
+hasher_pool = PasswordHasherPool()
+
+
+async def get_password_hash_async(password: str):
+    return await hasher_pool.run(get_password_hash, password)
+
+
+async def verify_password_async(new_pwd, hashed_pwd):
+    return await hasher_pool.run(
+        verify_password, new_pwd, hashed_pwd, stage="password_verify"
+    )
+
+
+async def verify_and_update_password_async(new_pwd, hashed_pwd):
+    return await hasher_pool.run(
+        verify_and_update_password, new_pwd, hashed_pwd, stage="password_verify"
+    )
+
+
+async def verify_dummy_password(password: str) -> bool:
+    """Spend a real Argon2 verification on a login that has no account, so
+    unknown and known accounts take the same time to reject."""
+    if hasher_pool.dummy_hash is None:
+        hasher_pool.dummy_hash = await get_password_hash_async(secrets.token_urlsafe(16))
+    await verify_password_async(password, hasher_pool.dummy_hash)
+    return False
@@ -0,0 +1,175 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from functools import cached_property
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from config.config import settings
+from database.connection_db import connection
+from utils.metrics import auth_outcomes
+
+
+class RateLimitBackend(ABC):
+    """Counts attempts per key in fixed windows of ``window`` seconds.
+
+    ``hit`` records one attempt and returns the attempt counts of the previous
+    and the current window; the limiter turns them into a sliding-window
+    estimate. Every attempt counts, rejected ones included, so a client has
+    to actually back off before it is let through again.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, window: float) -> tuple[int, int]:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process counters in a bounded LRU; the least recently hit keys are evicted first."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [window index, previous window count, current window count]
+        self._entries: OrderedDict[str, list[int]] = OrderedDict()
+        self.evicted = 0
+
+    async def hit(self, key: str, window: float) -> tuple[int, int]:
+        index = int(time.time() // window)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [index, 0, 0]
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != index:
+                entry[1] = entry[2] if entry[0] == index - 1 else 0
+                entry[2] = 0
+                entry[0] = index
+        entry[2] += 1
+        return entry[1], entry[2]
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._entries),
+            "max_keys": self.max_keys,
+            "evicted": self.evicted,
+        }
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """Counters shared by every worker through the UNLOGGED rate_limits table."""
+
+    async def hit(self, key: str, window: float) -> tuple[int, int]:
+        db_pool = await connection.get_connection()
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow_named(
+                "rate_limit_hit", key, int(time.time() // window), datetime.now()
+            )
+        return row["prev_count"], row["count"]
+
+
+class RateLimiter:
+    """Sliding-window limits keyed by route plus client IP or account.
+
+    Off unless RATE_LIMIT_ENABLED is set. Behind a reverse proxy, also set
+    RATE_LIMIT_TRUST_FORWARDED so the client IP comes from X-Forwarded-For;
+    otherwise every client is counted as the proxy and shares its bucket.
+    Account limits are counted per account and client IP, so failed attempts
+    from one address cannot lock the account out for everyone else.
+
+    The backend and window left out are taken from the settings on first use.
+    """
+
+    def __init__(
+        self, backend: Optional[RateLimitBackend] = None, window: Optional[float] = None
+    ):
+        if backend is not None:
+            self.backend = backend
+        if window is not None:
+            self.window = window
+        self.allowed = 0
+        self.rejected = 0
+
+    @cached_property
+    def backend(self) -> RateLimitBackend:
+        return create_backend()
+
+    @cached_property
+    def window(self) -> float:
+        return settings.RATE_LIMIT_WINDOW_SECONDS
+
+    def client_ip(self, request: Request) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",", 1)[0].strip()
+        # straight from the ASGI scope; request.client builds a new tuple per call
+        client = request.scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def retry_after(self, key: str, limit: int) -> float:
+        """Record an attempt on key and return how long to wait, 0 when allowed."""
+        previous, current = await self.backend.hit(key, self.window)
+        elapsed = time.time() % self.window
+        weight = 1 - elapsed / self.window
+        if previous * weight + current <= limit:
+            return 0.0
+        if current > limit or previous == 0:
+            return self.window - elapsed
+        # when the previous window's share decays enough to fit under the limit
+        fits_at = self.window * (1 - (limit - current) / previous)
+        return max(fits_at - elapsed, 1.0)
+
+    async def check(
+        self,
+        request: Request,
+        route: str,
+        ip_limit: int,
+        account: Optional[str] = None,
+        account_limit: int = 0,
+    ):
+        """Raise 429 with Retry-After once the client IP or the account is over its limit."""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        ip = self.client_ip(request)
+        wait = 0.0
+        if ip_limit:
+            wait = await self.retry_after(f"{route}:ip:{ip}", ip_limit)
+        if not wait and account and account_limit:
+            wait = await self.retry_after(f"{route}:account:{account.lower()}:{ip}", account_limit)
+        if not wait:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        auth_outcomes.labels(route, "rate_limited").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts. Please try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "backend": settings.RATE_LIMIT_BACKEND,
+            "window_seconds": self.window,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        } | self.backend.stats()
+
+
+def create_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "postgres":
+        return PostgresRateLimitBackend()
+    return MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,49 @@
+import time
+from functools import cached_property
+from typing import Optional
+
+from config.config import settings
+
+
+class RevocationSet:
+    """Users whose access tokens issued up to a given moment must not use the
+    stateless fast path. Entries expire once every such token has expired,
+    ttl seconds after the revocation; left out, it is the access token
+    lifetime from the settings."""
+
+    def __init__(self, ttl: Optional[float] = None):
+        if ttl is not None:
+            self.ttl = ttl
+        self._revoked_at: dict[str, float] = {}
+
+    @cached_property
+    def ttl(self) -> float:
+        return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    def revoke(self, user_id: str, revoked_at: Optional[float] = None):
+        self.merge({str(user_id): time.time() if revoked_at is None else revoked_at})
+
+    def merge(self, revocations: dict[str, float]):
+        """Add revocations, keeping the latest per user; replaying one is harmless."""
+        now = time.time()
+        entries = {
+            key: revoked_at
+            for key, revoked_at in self._revoked_at.items()
+            if revoked_at + self.ttl > now
+        }
+        for user_id, revoked_at in revocations.items():
+            if revoked_at + self.ttl > now and revoked_at > entries.get(user_id, 0):
+                entries[user_id] = revoked_at
+        self._revoked_at = entries
+
+    def is_revoked(self, user_id: str, issued_at: float) -> bool:
+        """Tokens carry a microsecond iat, so one issued after the revocation
+        passes even within the same second."""
+        revoked_at = self._revoked_at.get(str(user_id))
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def __len__(self):
+        return len(self._revoked_at)
+
+
+revoked_users = RevocationSet()
@@ -0,0 +1,79 @@
+import asyncio
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from config.config import settings
+
+
+class SMTPConnectionPool:
+    """A few long-lived SMTP sessions shared by the dispatcher.
+
+    Sessions connect lazily and are reopened when the server drops them, so
+    the TLS and AUTH handshakes are paid once per session, not per email.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle: asyncio.Queue[aiosmtplib.SMTP] = asyncio.Queue()
+        self.connections_opened = 0
+        for _ in range(size):
+            self.idle.put_nowait(self._client())
+
+    def _client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            use_tls=settings.MAIL_SSL,
+            start_tls=settings.MAIL_TLS,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            timeout=settings.MAIL_SMTP_TIMEOUT,
+        )
+
+    async def send(self, message: EmailMessage):
+        client = await self.idle.get()
+        try:
+            try:
+                await self._ensure_connected(client)
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # idle sessions get closed by the server; retry once on a fresh one
+                client.close()
+                await self._ensure_connected(client)
+                await client.send_message(message)
+        except aiosmtplib.SMTPResponseException:
+            # the server rejected this message; the session itself is fine
+            raise
+        except Exception:
+            client.close()
+            raise
+        finally:
+            self.idle.put_nowait(client)
+
+    async def _ensure_connected(self, client: aiosmtplib.SMTP):
+        if not client.is_connected:
+            await client.connect()
+            self.connections_opened += 1
+
+    @staticmethod
+    def is_permanent(error: BaseException) -> bool:
+        """A 5xx reply: retrying the same message will not help."""
+        if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+            # raised for the whole message, with each recipient's own reply
+            return bool(error.recipients) and all(
+                SMTPConnectionPool.is_permanent(refused) for refused in error.recipients
+            )
+        return (
+            isinstance(error, aiosmtplib.SMTPResponseException)
+            and 500 <= error.code < 600
+        )
+
+    async def close(self):
+        while not self.idle.empty():
+            client = self.idle.get_nowait()
+            if client.is_connected:
+                try:
+                    await client.quit()
+                except aiosmtplib.SMTPException:
+                    client.close()
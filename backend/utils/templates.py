@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Optional
+
+from jinja2 import Environment, FileSystemLoader, Template, nodes, select_autoescape
+from loguru import logger
+from markupsafe import escape
+
+from config.config import settings
+
+
+TEMPLATE_FOLDER = Path(__file__).parent / ".." / "templates"
+
+# static text and variable names alternate, starting and ending with text
+Segments = tuple[tuple[str, ...], tuple[str, ...]]
+
+
+class TemplateRenderer:
+    """Email templates compiled once and rendered from memory.
+
+    Templates made only of literal HTML and plain ``{{ name }}`` fields are
+    also split into static segments, so rendering them is a join of the
+    segments with the escaped per-user values instead of a Jinja render.
+    """
+
+    def __init__(self, folder: Path = TEMPLATE_FOLDER):
+        # no auto_reload: the compiled templates are never re-checked on disk
+        self.env = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+        )
+        self.templates: dict[str, Template] = {}
+        self.segments: dict[str, Segments] = {}
+
+    def load(self):
+        for name in self.env.list_templates():
+            self._compile(name)
+        logger.info(
+            f"Compiled {len(self.templates)} email templates, "
+            f"{len(self.segments)} pre-rendered"
+        )
+
+    def _compile(self, name: str) -> Template:
+        template = self.templates[name] = self.env.get_template(name)
+        if settings.MAIL_TEMPLATE_PRERENDER and self.env.autoescape(name):
+            source = self.env.loader.get_source(self.env, name)[0]
+            segments = self._split(self.env.parse(source))
+            if segments is not None:
+                self.segments[name] = segments
+        return template
+
+    @staticmethod
+    def _split(tree: nodes.Template) -> Optional[Segments]:
+        texts, fields = [""], []
+        for output in tree.body:
+            if not isinstance(output, nodes.Output):
+                return None
+            for node in output.nodes:
+                if isinstance(node, nodes.TemplateData):
+                    texts[-1] += node.data
+                elif isinstance(node, nodes.Name):
+                    fields.append(node.name)
+                    texts.append("")
+                else:
+                    return None
+        return tuple(texts), tuple(fields)
+
+    def render(self, name: str, context: dict) -> str:
+        segments = self.segments.get(name)
+        if segments is None:
+            template = self.templates.get(name) or self._compile(name)
+            return template.render(**context)
+        texts, fields = segments
+        parts = [texts[0]]
+        for field, text in zip(fields, texts[1:]):
+            # Jinja renders a missing variable as an empty string
+            parts.append(escape(context.get(field, "")))
+            parts.append(text)
+        return "".join(parts)
+
+
+template_renderer = TemplateRenderer()
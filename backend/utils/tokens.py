@@ -1,52 +1,220 @@
-from datetime import timedelta, datetime, timezone
+from datetime import timedelta
 import secrets
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
 
 from fastapi import HTTPException, status
 import jwt
+from jwt.algorithms import HMACAlgorithm
+from jwt.utils import base64url_encode
 from config.config import settings
+from utils.metrics import stage_timer
 import uuid
 import hashlib
 
 
+EMBEDDED_CLAIMS = (
+    "email",
+    "username",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_verified",
+)
+
+# members of the public JWK that make up its RFC 7638 thumbprint
+THUMBPRINT_MEMBERS = {
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+    "RSA": ("e", "kty", "n"),
+}
+
+
+class TokenEngine:
+    """Signs and verifies JWTs with key material prepared once.
+
+    HMAC algorithms sign with a shared secret. Asymmetric ones (EdDSA, ES256,
+    RS256, ...) sign with a private key and put its kid, the RFC 7638
+    thumbprint of the public key, in the header; retired public keys keep
+    verifying the tokens they signed until those expire. Verified claims are
+    kept in a bounded LRU keyed by the token digest, never past their exp.
+    """
+
+    def __init__(
+        self,
+        algorithm: str,
+        secret: str = "",
+        private_key: Optional[bytes] = None,
+        public_keys: tuple[bytes, ...] = (),
+        cache_size: int = 0,
+    ):
+        self.algorithm = algorithm
+        self.signer = jwt.get_algorithm_by_name(algorithm)
+        # kid -> prepared verification key; HMAC keys have no kid
+        self.keys: dict[Optional[str], object] = {}
+        self.kid: Optional[str] = None
+        self.public_jwks: list[dict] = []
+        if isinstance(self.signer, HMACAlgorithm):
+            if not secret:
+                raise ValueError(f"{algorithm} needs TOKEN_SECRET_KEY")
+            self.signing_key = self.signer.prepare_key(secret)
+            self.keys[None] = self.signing_key
+        else:
+            if private_key is None:
+                raise ValueError(f"{algorithm} needs TOKEN_PRIVATE_KEY_FILE")
+            self.signing_key = self.signer.prepare_key(private_key)
+            self.kid = self.add_public_key(self.signing_key.public_key())
+            for pem in public_keys:
+                key = self.signer.prepare_key(pem)
+                self.add_public_key(key.public_key() if hasattr(key, "private_bytes") else key)
+        header = {"alg": algorithm, "typ": "JWT"}
+        if self.kid:
+            header["kid"] = self.kid
+        self.header_segment = base64url_encode(
+            json.dumps(header, separators=(",", ":"), sort_keys=True).encode()
+        )
+        # published as-is by /.well-known/jwks.json; empty for HMAC secrets
+        self.jwks_document = json.dumps(
+            {"keys": self.public_jwks}, separators=(",", ":")
+        ).encode()
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks_document).hexdigest()[:32]}"'
+        self.cache_size = cache_size
+        # token digest -> (exp, claims)
+        self._cache: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def add_public_key(self, key) -> str:
+        jwk = self.signer.to_jwk(key, as_dict=True)
+        members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+        digest = hashlib.sha256(
+            json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+        ).digest()
+        kid = base64url_encode(digest).decode()
+        self.keys[kid] = key
+        self.public_jwks.append(jwk | {"kid": kid, "alg": self.algorithm, "use": "sig"})
+        return kid
+
+    def encode(
+        self,
+        data: dict,
+        expires_in: Optional[timedelta] = None,
+        token_type: str = "access",
+    ) -> str:
+        if expires_in is None:
+            expires_in = (
+                timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+                if token_type == "access"
+                else timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+            )
+        # microseconds, the precision of revocation times: a whole-second iat
+        # would put a login made right after a logout-all under its revocation
+        issued_at = int(time.time() * 1_000_000) / 1_000_000
+        payload = data | {
+            "exp": int(issued_at) + int(expires_in.total_seconds()),
+            "iat": issued_at,
+        }
+        if token_type != "access":
+            payload["jti"] = str(uuid.uuid4())
+        signing_input = self.header_segment + b"." + base64url_encode(
+            json.dumps(payload, separators=(",", ":")).encode()
+        )
+        signature = self.signer.sign(signing_input, self.signing_key)
+        return (signing_input + b"." + base64url_encode(signature)).decode()
+
+    def decode(self, token: str, cache: bool = True) -> dict:
+        """Verified claims of token; raises jwt.InvalidTokenError subclasses."""
+        digest = None
+        if cache and self.cache_size > 0:
+            digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+            entry = self._cache.get(digest)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._cache.move_to_end(digest)
+                    self.hits += 1
+                    return dict(entry[1])
+                # expired: drop it and let the full decode raise
+                del self._cache[digest]
+            self.misses += 1
+        if len(self.keys) == 1:
+            key = next(iter(self.keys.values()))
+        else:
+            key = self.keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise jwt.InvalidTokenError("Unknown signing key")
+        claims = jwt.decode(token, key, algorithms=[self.algorithm])
+        exp = claims.get("exp")
+        if digest is not None and isinstance(exp, (int, float)):
+            self._cache[digest] = (exp, claims)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return dict(claims)
+        return claims
+
+    def stats(self) -> dict:
+        return {
+            "algorithm": self.algorithm,
+            "kid": self.kid,
+            "verification_keys": len(self.keys),
+            "cache_size": len(self._cache),
+            "cache_max_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def create_engine() -> TokenEngine:
+    private_key = None
+    if settings.TOKEN_PRIVATE_KEY_FILE:
+        with open(settings.TOKEN_PRIVATE_KEY_FILE, "rb") as f:
+            private_key = f.read()
+    public_keys = []
+    for path in filter(None, map(str.strip, settings.TOKEN_PUBLIC_KEY_FILES.split(","))):
+        with open(path, "rb") as f:
+            public_keys.append(f.read())
+    return TokenEngine(
+        settings.TOKEN_ALGORITHM,
+        settings.TOKEN_SECRET_KEY,
+        private_key,
+        tuple(public_keys),
+        settings.TOKEN_VERIFY_CACHE_SIZE,
+    )
+
+
+@lru_cache
+def get_token_engine() -> TokenEngine:
+    """The engine the app signs and verifies with, built on first use."""
+    return create_engine()
+
+
+JWT_SIGN = stage_timer("jwt_sign")
+JWT_VERIFY = stage_timer("jwt_verify")
+
+
 def generate_token(
     data: dict,
     expiry_date: timedelta | None = None,
     token_type: str = "access"
 ):
-    payload = data.copy()
-    if expiry_date:
-        expire = datetime.now(tz=timezone.utc) + expiry_date
-    else:
-        expire = (
-            datetime.now(tz=timezone.utc)
-            + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-            if token_type == "access"
-            else datetime.now(tz=timezone.utc)
-            + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        )
-    issued_at = datetime.now(tz=timezone.utc)
-    if token_type == "access":
-        payload.update({"exp": expire, "iat": issued_at})
-    else:
-        payload.update(
-            {"exp": expire, "iat": issued_at, "jti": str(uuid.uuid4())})
-    encoded_jwt = jwt.encode(
-        payload, settings.TOKEN_SECRET_KEY, settings.TOKEN_ALGORITHM
-    )
-    return encoded_jwt
+    started = time.perf_counter()
+    token = get_token_engine().encode(data, expiry_date, token_type)
+    JWT_SIGN.observe(time.perf_counter() - started)
+    return token
 
 
-def decode_token(token: str):
+def decode_token(token: str, cache: bool = True):
+    started = time.perf_counter()
     try:
-        payload = jwt.decode(
-            token,
-            settings.TOKEN_SECRET_KEY,
-            settings.TOKEN_ALGORITHM)
-        return payload
+        return get_token_engine().decode(token, cache)
     except jwt.InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
+    finally:
+        JWT_VERIFY.observe(time.perf_counter() - started)
 
 
 def get_hash_token(token: str):
@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Optional
+
+from config.config import settings
+
+
+class UserCache:
+    """Bounded LRU of user rows keyed by user_id, each entry living ttl seconds.
+
+    Sizes left out are read from the settings on first use.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        if max_size is not None:
+            self.max_size = max_size
+        if ttl is not None:
+            self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @cached_property
+    def max_size(self) -> int:
+        return settings.USER_CACHE_MAX_SIZE
+
+    @cached_property
+    def ttl(self) -> float:
+        return settings.USER_CACHE_TTL_SECONDS
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, user_id: str, user: dict):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+user_cache = UserCache()